@@ -0,0 +1,366 @@
+import fcntl
+import fnmatch
+import hashlib
+import logging
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'YTCACHE2'
+HEADER = struct.Struct('<8sII')
+SLOT_HEADER = struct.Struct('<BBxxQdHI')
+
+EMPTY, USED, DELETED = 0, 1, 2
+# Первый байт значения: как хранится pickle.
+RAW, COMPRESSED = b'p', b'z'
+
+_segments = {}
+_segments_lock = threading.Lock()
+
+
+def _hash(key):
+    digest = hashlib.blake2b(key, digest_size=8).digest()
+    return struct.unpack('<Q', digest)[0]
+
+
+def _loads(raw):
+    if raw[:1] == COMPRESSED:
+        return pickle.loads(zlib.decompress(raw[1:]))
+    return pickle.loads(raw[1:])
+
+
+class _Segment:
+    """Файл, отображённый в память, с хэш-таблицей слотов фиксированного
+    размера. Один на процесс и путь: потоки делят его под общей
+    блокировкой, процессы разделяют через ``flock``.
+    """
+
+    def __init__(self, path, slots, slot_size):
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        self.size = HEADER.size + slots * slot_size
+        self.pid = os.getpid()
+        self.lock = threading.RLock()
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self.fd).st_size != self.size:
+                os.ftruncate(self.fd, 0)
+                os.ftruncate(self.fd, self.size)
+            self.map = mmap.mmap(self.fd, self.size)
+            if HEADER.unpack_from(self.map) != (MAGIC, slots, slot_size):
+                self.clear()
+                HEADER.pack_into(self.map, 0, MAGIC, slots, slot_size)
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    @classmethod
+    def open(cls, path, slots, slot_size):
+        with _segments_lock:
+            segment = _segments.get(path)
+            # После fork дескриптор общий с родителем, и flock его
+            # не отделит: процессу нужен свой.
+            if segment is None or segment.pid != os.getpid():
+                segment = _segments[path] = cls(path, slots, slot_size)
+            return segment
+
+    @contextmanager
+    def locked(self, exclusive):
+        with self.lock:
+            fcntl.flock(self.fd,
+                        fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def offset(self, index):
+        return HEADER.size + index * self.slot_size
+
+    def read_header(self, index):
+        return SLOT_HEADER.unpack_from(self.map, self.offset(index))
+
+    def read_key(self, index, key_length):
+        start = self.offset(index) + SLOT_HEADER.size
+        return self.map[start:start + key_length]
+
+    def read_value(self, index, key_length, value_length):
+        start = self.offset(index) + SLOT_HEADER.size + key_length
+        return self.map[start:start + value_length]
+
+    def mark(self, index, state):
+        self.map[self.offset(index)] = state
+
+    def touch_ref(self, index):
+        self.map[self.offset(index) + 1] = 1
+
+    def write(self, index, key_hash, key, value, expires):
+        offset = self.offset(index)
+        SLOT_HEADER.pack_into(self.map, offset, USED, 1, key_hash, expires,
+                              len(key), len(value))
+        start = offset + SLOT_HEADER.size
+        self.map[start:start + len(key)] = key
+        self.map[start + len(key):start + len(key) + len(value)] = value
+
+    def fits(self, key, value):
+        return SLOT_HEADER.size + len(key) + len(value) <= self.slot_size
+
+    def clear(self):
+        chunk = bytes(self.slot_size * 256)
+        position = HEADER.size
+        while position < self.size:
+            end = min(position + len(chunk), self.size)
+            self.map[position:end] = chunk[:end - position]
+            position = end
+
+
+class SharedMemoryCache(BaseCache):
+    """Кеш в общем для всех процессов хоста файле, отображённом в память.
+
+    Таблица открытой адресации: ключ ищется в окне из ``PROBES`` слотов
+    от своего хэша. Если свободного слота в окне нет, вытеснение идёт по
+    алгоритму часов внутри окна: слоты, к которым обращались после
+    прошлого прохода, получают второй шанс. Значение крупнее слота
+    сжимается zlib; если не помещается и сжатым, оно не кешируется,
+    а размер попадает в лог и метрику ``cache_dropped_bytes``.
+
+    LOCATION — путь к файлу; OPTIONS: ``SLOTS``, ``SLOT_SIZE``, ``PROBES``.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.location = location
+        self.slots = int(options.get('SLOTS', 16384))
+        self.slot_size = int(options.get('SLOT_SIZE', 4096))
+        self.probes = min(int(options.get('PROBES', 16)), self.slots)
+
+    @property
+    def segment(self):
+        return _Segment.open(self.location, self.slots, self.slot_size)
+
+    def _window(self, key_hash):
+        start = key_hash % self.slots
+        return [(start + step) % self.slots for step in range(self.probes)]
+
+    def _find(self, segment, key, key_hash, now):
+        """Слот с живой записью ключа или None."""
+        for index in self._window(key_hash):
+            state, _, slot_hash, expires, key_length, value_length = (
+                segment.read_header(index))
+            if state == EMPTY:
+                return None
+            if (state == USED and slot_hash == key_hash
+                    and segment.read_key(index, key_length) == key):
+                if expires and expires <= now:
+                    return None
+                return index, key_length, value_length
+        return None
+
+    def _slot_for(self, segment, key, key_hash, now):
+        """Слот для записи ключа: его прежний слот, свободный или
+        вытесненный часами.
+        """
+        free = None
+        window = self._window(key_hash)
+        for index in window:
+            state, _, slot_hash, expires, key_length, _ = (
+                segment.read_header(index))
+            if state == USED and slot_hash == key_hash and (
+                    segment.read_key(index, key_length) == key):
+                return index
+            expired = state == USED and expires and expires <= now
+            if free is None and (state != USED or expired):
+                free = index
+            if state == EMPTY:
+                break
+        if free is not None:
+            return free
+        for _ in range(2):
+            for index in window:
+                offset = segment.offset(index)
+                if segment.map[offset + 1]:
+                    segment.map[offset + 1] = 0
+                else:
+                    return index
+        return window[0]
+
+    def _dumps(self, key, value):
+        """Сериализовать значение; сжать, если целиком в слот не влезет."""
+        raw = RAW + pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if SLOT_HEADER.size + len(key) + len(raw) <= self.slot_size:
+            return raw
+        return COMPRESSED + zlib.compress(raw[1:])
+
+    def _expires(self, timeout):
+        expires = self.get_backend_timeout(timeout)
+        return 0.0 if expires is None else expires
+
+    def _get(self, segment, key, now):
+        found = self._find(segment, key, _hash(key), now)
+        if found is None:
+            return None
+        index, key_length, value_length = found
+        segment.touch_ref(index)
+        return bytes(segment.read_value(index, key_length, value_length))
+
+    def _set(self, segment, key, value, expires, now):
+        key_hash = _hash(key)
+        if not segment.fits(key, value):
+            self._delete(segment, key)
+            logger.warning('Значение %s (%d байт) не помещается в слот '
+                           '%s', key.decode(), len(value), self.location)
+            metrics.observe('cache_dropped_bytes', len(value))
+            return False
+        index = self._slot_for(segment, key, key_hash, now)
+        segment.write(index, key_hash, key, value, expires)
+        return True
+
+    def _delete(self, segment, key):
+        found = self._find(segment, key, _hash(key), time.time())
+        if found is None:
+            return False
+        segment.mark(found[0], DELETED)
+        return True
+
+    def _encode(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key.encode()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._encode(key, version)
+        value = self._dumps(key, value)
+        segment = self.segment
+        with segment.locked(exclusive=True):
+            now = time.time()
+            if self._find(segment, key, _hash(key), now) is not None:
+                return False
+            return self._set(segment, key, value, self._expires(timeout),
+                             now)
+
+    def get(self, key, default=None, version=None):
+        key = self._encode(key, version)
+        segment = self.segment
+        with segment.locked(exclusive=False):
+            raw = self._get(segment, key, time.time())
+        if raw is None:
+            return default
+        return _loads(raw)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._encode(key, version)
+        value = self._dumps(key, value)
+        segment = self.segment
+        with segment.locked(exclusive=True):
+            self._set(segment, key, value, self._expires(timeout),
+                      time.time())
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._encode(key, version)
+        segment = self.segment
+        with segment.locked(exclusive=True):
+            now = time.time()
+            found = self._find(segment, key, _hash(key), now)
+            if found is None:
+                return False
+            index = found[0]
+            value = bytes(segment.read_value(*found))
+            segment.write(index, _hash(key), key, value,
+                          self._expires(timeout))
+            return True
+
+    def delete(self, key, version=None):
+        key = self._encode(key, version)
+        segment = self.segment
+        with segment.locked(exclusive=True):
+            self._delete(segment, key)
+
+    def has_key(self, key, version=None):
+        key = self._encode(key, version)
+        segment = self.segment
+        with segment.locked(exclusive=False):
+            return self._find(segment, key, _hash(key),
+                              time.time()) is not None
+
+    def get_many(self, keys, version=None):
+        encoded = {self._encode(key, version): key for key in keys}
+        segment = self.segment
+        found = {}
+        with segment.locked(exclusive=False):
+            now = time.time()
+            for key, original in encoded.items():
+                raw = self._get(segment, key, now)
+                if raw is not None:
+                    found[original] = raw
+        return {key: _loads(raw) for key, raw in found.items()}
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        prepared = []
+        for original, value in data.items():
+            key = self._encode(original, version)
+            prepared.append((original, key, self._dumps(key, value)))
+        failed = []
+        segment = self.segment
+        with segment.locked(exclusive=True):
+            now = time.time()
+            expires = self._expires(timeout)
+            for original, key, value in prepared:
+                if not self._set(segment, key, value, expires, now):
+                    failed.append(original)
+        return failed
+
+    def delete_many(self, keys, version=None):
+        encoded = [self._encode(key, version) for key in keys]
+        segment = self.segment
+        with segment.locked(exclusive=True):
+            for key in encoded:
+                self._delete(segment, key)
+
+    def incr(self, key, delta=1, version=None):
+        key = self._encode(key, version)
+        segment = self.segment
+        with segment.locked(exclusive=True):
+            now = time.time()
+            found = self._find(segment, key, _hash(key), now)
+            if found is None:
+                raise ValueError("Key '%s' not found" % key.decode())
+            index, key_length, value_length = found
+            _, _, _, expires, _, _ = segment.read_header(index)
+            value = _loads(
+                segment.read_value(index, key_length, value_length)) + delta
+            self._set(segment, key, self._dumps(key, value), expires, now)
+        return value
+
+    def delete_pattern(self, pattern, version=None):
+        """Удалить ключи по шаблону fnmatch, например ``'feed:*'``."""
+        pattern = self.make_key(pattern, version=version)
+        segment = self.segment
+        deleted = 0
+        with segment.locked(exclusive=True):
+            for index in range(self.slots):
+                state, _, _, _, key_length, _ = segment.read_header(index)
+                if state != USED:
+                    continue
+                key = bytes(segment.read_key(index, key_length)).decode()
+                if fnmatch.fnmatchcase(key, pattern):
+                    segment.mark(index, DELETED)
+                    deleted += 1
+        return deleted
+
+    def clear(self):
+        segment = self.segment
+        with segment.locked(exclusive=True):
+            segment.clear()
@@ -0,0 +1,161 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import metrics
+from .jobs import task
+from .models import ChangeEvent
+
+_caches = []
+
+
+class LocalCache:
+    """LRU-кеш внутри процесса, записи которого помечены тегами.
+
+    Запись вытесняется, как только по шине приходит любой из её тегов.
+    Хранимые объекты общие для потоков процесса и только для чтения.
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize or settings.LOCAL_CACHE_SIZE
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.keys_by_tag = {}
+        _caches.append(self)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, tags):
+        with self.lock:
+            self._discard(key)
+            self.entries[key] = (value, tuple(tags))
+            for tag in tags:
+                self.keys_by_tag.setdefault(tag, set()).add(key)
+            while len(self.entries) > self.maxsize:
+                self._discard(next(iter(self.entries)))
+
+    def _discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[1]:
+            keys = self.keys_by_tag.get(tag)
+            keys.discard(key)
+            if not keys:
+                del self.keys_by_tag[tag]
+
+    def invalidate(self, tag):
+        with self.lock:
+            for key in list(self.keys_by_tag.get(tag, ())):
+                self._discard(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.keys_by_tag.clear()
+
+
+def evict(tags):
+    for local_cache in _caches:
+        for tag in tags:
+            local_cache.invalidate(tag)
+
+
+def clear_local_caches():
+    for local_cache in _caches:
+        local_cache.clear()
+
+
+def publish(*tags):
+    """Разослать теги изменившихся объектов всем воркерам.
+
+    События пишутся в той же транзакции, что и само изменение, поэтому
+    видны другим процессам только после коммита. Свой процесс чистит
+    кеши сразу.
+    """
+    ChangeEvent.objects.bulk_create(ChangeEvent(tag=tag) for tag in tags)
+    evict(tags)
+
+
+@task
+def prune_change_log(older_than=None):
+    """Удалить события старше ``older_than`` секунд (по умолчанию —
+    срока хранения ``INVALIDATION_RETENTION``); вернуть их число.
+
+    Воркеры ставят задачу раз в интервал из ``JOBS_PERIODIC``.
+    """
+    if older_than is None:
+        older_than = settings.INVALIDATION_RETENTION
+    border = timezone.now() - timedelta(seconds=older_than)
+    deleted, _ = ChangeEvent.objects.filter(created__lt=border).delete()
+    return deleted
+
+
+class Subscriber:
+    """Читает журнал изменений и вытесняет затронутые ключи.
+
+    Журнал опрашивается не чаще раза в ``INVALIDATION_POLL_INTERVAL``
+    секунд, так что устаревшие данные живут не дольше интервала плюс
+    время запроса. Если процесс не опрашивал журнал дольше, чем журнал
+    хранится, часть событий могла быть уже удалена, и кеши процесса
+    сбрасываются целиком.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last_id = None
+        self.last_poll = None
+
+    def poll_if_due(self):
+        last_poll = self.last_poll
+        if (last_poll is not None and time.monotonic() - last_poll
+                < settings.INVALIDATION_POLL_INTERVAL):
+            return 0
+        if not self.lock.acquire(blocking=False):
+            return 0
+        try:
+            return self.poll()
+        finally:
+            self.lock.release()
+
+    def poll(self):
+        now = time.monotonic()
+        stale = (self.last_poll is not None and now - self.last_poll
+                 > settings.INVALIDATION_RETENTION)
+        self.last_poll = now
+        if self.last_id is None or stale:
+            # Кеши до первого опроса пусты: достаточно запомнить,
+            # с какого места читать.
+            latest = ChangeEvent.objects.order_by('-id').first()
+            self.last_id = latest.id if latest else 0
+            if stale:
+                clear_local_caches()
+            return 0
+        delivered = 0
+        while True:
+            events = list(ChangeEvent.objects.filter(
+                id__gt=self.last_id
+            ).values_list('id', 'tag', 'created')[
+                :settings.INVALIDATION_BATCH_SIZE])
+            if not events:
+                return delivered
+            received = timezone.now()
+            evict({tag for _, tag, _ in events})
+            for _, _, created in events:
+                metrics.observe('invalidation_lag',
+                                (received - created).total_seconds())
+            self.last_id = events[-1][0]
+            delivered += len(events)
+
+
+subscriber = Subscriber()
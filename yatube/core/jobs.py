@@ -0,0 +1,263 @@
+import json
+import logging
+import os
+import signal
+import socket
+import time
+import traceback
+from datetime import timedelta
+from functools import update_wrapper
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Min, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import metrics
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+# (id задачи, воркер) — задача, которую сейчас выполняет процесс.
+_current = None
+
+
+class LeaseLost(Exception):
+    """Срок блокировки задачи истёк, и её забрал другой воркер."""
+
+
+class Task:
+    """Функция, которую можно поставить в очередь: ``func.delay(*args)``.
+
+    Прямой вызов выполняет функцию сразу.
+    """
+
+    def __init__(self, func, max_attempts):
+        update_wrapper(self, func)
+        self.func = func
+        self.name = f'{func.__module__}.{func.__qualname__}'
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args):
+        return self.func(*args)
+
+    def delay(self, *args):
+        """Поставить задачу в очередь в текущей транзакции.
+
+        Аргументы хранятся в JSON. Задача видна воркерам только после
+        коммита, вместе с данными, ради которых она создана.
+        """
+        return Job.objects.create(
+            task=self.name,
+            args=json.dumps(args),
+            max_attempts=self.max_attempts or settings.JOBS_MAX_ATTEMPTS,
+            run_at=timezone.now(),
+        )
+
+
+def task(func=None, *, max_attempts=None):
+    """Декоратор функции уровня модуля, делающий её задачей очереди."""
+    def register(func):
+        registered = _tasks[f'{func.__module__}.{func.__qualname__}'] = (
+            Task(func, max_attempts))
+        return registered
+    if func is None:
+        return register
+    return register(func)
+
+
+def resolve(name):
+    """Задача по имени; модуль импортируется, если ещё не загружен."""
+    if name not in _tasks:
+        import_string(name)
+    if name not in _tasks:
+        raise LookupError(f'{name} не объявлена через @task')
+    return _tasks[name]
+
+
+def worker_id():
+    """Имя процесса в блокировках: хост и pid."""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def retry_delay(attempts):
+    """Пауза перед следующей попыткой: растёт вдвое с каждой неудачей."""
+    delay = settings.JOBS_RETRY_DELAY * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(delay, settings.JOBS_RETRY_MAX_DELAY))
+
+
+def _ready(now):
+    # Блокировка с истёкшим сроком — воркер упал, не закончив задачу.
+    return Job.objects.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now),
+        state=Job.PENDING, run_at__lte=now,
+    )
+
+
+def claim(worker_id, batch_size):
+    """Забрать до ``batch_size`` готовых задач под блокировку воркера.
+
+    Захват — один UPDATE с подзапросом ``FOR UPDATE SKIP LOCKED``, так
+    что воркеры не ждут друг друга. В SQLite, где ``FOR UPDATE`` нет,
+    UPDATE сразу берёт блокировку записи: отдельный SELECT перед ним
+    в той же транзакции ловил бы взаимную блокировку воркеров.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = _ready(now).select_for_update(skip_locked=True).values(
+            'pk')[:batch_size]
+        taken = Job.objects.filter(pk__in=batch).update(
+            locked_by=worker_id,
+            locked_until=now + timedelta(seconds=settings.JOBS_LOCK_TIMEOUT),
+            attempts=F('attempts') + 1,
+        )
+    if not taken:
+        return []
+    return list(Job.objects.filter(locked_by=worker_id, state=Job.PENDING))
+
+
+def renew(job_id, worker_id):
+    """Продлить блокировку задачи на ``JOBS_LOCK_TIMEOUT``; False, если
+    задача уже не принадлежит воркеру.
+    """
+    return bool(Job.objects.filter(
+        pk=job_id, locked_by=worker_id, state=Job.PENDING,
+    ).update(locked_until=timezone.now() + timedelta(
+        seconds=settings.JOBS_LOCK_TIMEOUT)))
+
+
+def heartbeat():
+    """Продлить блокировку выполняемой задачи.
+
+    Длинные задачи зовут его перед каждым куском работы, чтобы их не
+    забрал другой воркер; если блокировку уже забрали, выбрасывает
+    ``LeaseLost`` и задача прерывается. Вне воркера ничего не делает.
+    """
+    if _current is not None and not renew(*_current):
+        raise LeaseLost(f'Задачу {_current[0]} забрал другой воркер')
+
+
+def release(jobs, worker_id):
+    """Вернуть в очередь захваченные, но не начатые задачи."""
+    Job.objects.filter(
+        pk__in=[job.pk for job in jobs], locked_by=worker_id,
+    ).update(locked_by='', locked_until=None, attempts=F('attempts') - 1)
+
+
+def execute(job, worker_id):
+    """Выполнить задачу: удалить при успехе, иначе отложить или
+    пометить ``failed``, если попытки кончились.
+    """
+    global _current
+    started = timezone.now()
+    metrics.observe('job_lag', (started - job.run_at).total_seconds())
+    clock = time.monotonic()
+    _current = (job.pk, worker_id)
+    try:
+        resolve(job.task)(*json.loads(job.args))
+    except LeaseLost:
+        logger.warning('Задача %s прервана: её забрал другой воркер', job)
+        return False
+    except Exception:
+        logger.exception('Задача %s завершилась ошибкой', job)
+        mine = Job.objects.filter(pk=job.pk, locked_by=worker_id)
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            mine.update(state=Job.FAILED, locked_by='', locked_until=None,
+                        last_error=error)
+        else:
+            mine.update(run_at=timezone.now() + retry_delay(job.attempts),
+                        locked_by='', locked_until=None, last_error=error)
+        return False
+    finally:
+        _current = None
+        metrics.observe('job_seconds', time.monotonic() - clock)
+    Job.objects.filter(pk=job.pk, locked_by=worker_id).delete()
+    return True
+
+
+def schedule_periodic():
+    """Поставить периодические задачи ``JOBS_PERIODIC``, чей срок подошёл.
+
+    Срок — ключ в общем кеше хоста на время интервала: из всех воркеров
+    задачу ставит тот, кто первым занял ключ. Сами задачи должны быть
+    безопасны к повтору: на разных хостах они могут совпасть.
+    """
+    for name, interval in settings.JOBS_PERIODIC.items():
+        if cache.add(f'core:jobs:periodic:{name}', True, interval):
+            resolve(name).delay()
+
+
+def queue_stats():
+    """Глубина очереди и возраст самой старой готовой задачи."""
+    now = timezone.now()
+    ready = _ready(now)
+    oldest = ready.aggregate(oldest=Min('run_at'))['oldest']
+    return {
+        'ready': ready.count(),
+        'scheduled': Job.objects.filter(state=Job.PENDING,
+                                        run_at__gt=now).count(),
+        'failed': Job.objects.filter(state=Job.FAILED).count(),
+        'lag_seconds': (now - oldest).total_seconds() if oldest else 0,
+    }
+
+
+class Worker:
+    """Цикл воркера: забрать пачку задач, выполнить, повторить.
+
+    Блокировка каждой задачи продлевается перед её запуском, а длинные
+    задачи продлевают её сами через ``heartbeat``. Между пачками воркер
+    ставит периодические задачи.
+
+    Останавливается по SIGTERM или SIGINT после текущей задачи; не
+    начатые задачи пачки сразу возвращаются в очередь.
+    """
+
+    def __init__(self, batch_size=None, poll_interval=None):
+        self.id = worker_id()
+        self.batch_size = batch_size or settings.JOBS_BATCH_SIZE
+        self.poll_interval = (settings.JOBS_POLL_INTERVAL
+                              if poll_interval is None else poll_interval)
+        self.stopping = False
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def run_batch(self):
+        """Выполнить одну пачку; вернуть число взятых задач."""
+        jobs = claim(self.id, self.batch_size)
+        for position, job in enumerate(jobs):
+            if self.stopping:
+                release(jobs[position:], self.id)
+                break
+            # Пока шли задачи впереди, срок блокировки мог истечь и
+            # задачу мог забрать другой воркер.
+            if renew(job.pk, self.id):
+                execute(job, self.id)
+        return len(jobs)
+
+    def run(self, once=False):
+        """Работать до сигнала; с ``once`` — пока очередь не опустеет."""
+        previous = {signum: signal.signal(signum, self.stop)
+                    for signum in (signal.SIGTERM, signal.SIGINT)}
+        flushed = time.monotonic()
+        try:
+            while not self.stopping:
+                if not once:
+                    schedule_periodic()
+                taken = self.run_batch()
+                if time.monotonic() - flushed >= (
+                        settings.METRICS_FLUSH_INTERVAL):
+                    metrics.flush()
+                    flushed = time.monotonic()
+                if not taken:
+                    if once:
+                        break
+                    time.sleep(self.poll_interval)
+        finally:
+            metrics.flush()
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
@@ -0,0 +1,118 @@
+import pickle
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+from django.utils import timezone
+
+from .jobs import heartbeat, retry_delay, task, worker_id
+from .models import OutboxMessage
+
+
+class DeliveryError(Exception):
+    """Часть писем не отправлена; задача повторится с паузой."""
+
+
+class OutboxBackend(BaseEmailBackend):
+    """Почтовый backend, который не ходит в сеть, а кладёт письма в
+    outbox в текущей транзакции и ставит задачу ``deliver_outbox``.
+    """
+
+    def send_messages(self, email_messages):
+        rows = []
+        for message in email_messages:
+            if not message.recipients():
+                continue
+            message.connection = None
+            rows.append(OutboxMessage(
+                subject=message.subject[:255],
+                recipients=', '.join(message.recipients()),
+                payload=pickle.dumps(message, pickle.HIGHEST_PROTOCOL),
+            ))
+        if rows:
+            OutboxMessage.objects.bulk_create(rows)
+            deliver_outbox.delay()
+        return len(rows)
+
+
+class Throttle:
+    """Не больше ``rate`` вызовов ``wait`` в секунду; 0 — без ограничения."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_at = time.monotonic()
+
+    def wait(self):
+        now = time.monotonic()
+        if self.next_at > now:
+            time.sleep(self.next_at - now)
+        self.next_at = max(now, self.next_at) + self.interval
+
+
+def claim(owner, batch_size):
+    """Забрать пачку писем так же, как воркеры забирают задачи."""
+    now = timezone.now()
+    with transaction.atomic():
+        # Упавшие письма откладываются тем же полем locked_until.
+        ready = (OutboxMessage.objects
+                 .filter(attempts__lt=settings.OUTBOX_MAX_ATTEMPTS)
+                 .exclude(locked_until__gte=now))
+        batch = ready.select_for_update(skip_locked=True).values(
+            'pk')[:batch_size]
+        taken = OutboxMessage.objects.filter(pk__in=batch).update(
+            locked_by=owner,
+            locked_until=now + timedelta(seconds=settings.JOBS_LOCK_TIMEOUT),
+        )
+    if not taken:
+        return []
+    return list(OutboxMessage.objects.filter(locked_by=owner))
+
+
+def send_batch(rows, owner, throttle):
+    """Отправить пачку через одно соединение; вернуть число неудач."""
+    sent = []
+    failed = 0
+    with get_connection(settings.OUTBOX_EMAIL_BACKEND) as connection:
+        for row in rows:
+            throttle.wait()
+            try:
+                connection.send_messages([pickle.loads(row.payload)])
+            except Exception:
+                failed += 1
+                OutboxMessage.objects.filter(
+                    pk=row.pk, locked_by=owner).update(
+                    attempts=row.attempts + 1,
+                    locked_by='',
+                    locked_until=(timezone.now()
+                                  + retry_delay(row.attempts + 1)),
+                    last_error=traceback.format_exc(),
+                )
+            else:
+                sent.append(row.pk)
+    OutboxMessage.objects.filter(pk__in=sent, locked_by=owner).delete()
+    return failed
+
+
+@task
+def deliver_outbox():
+    """Отправить все готовые письма пачками по ``OUTBOX_BATCH_SIZE``.
+
+    Задача ставится на каждую запись в outbox, но первая же вычерпывает
+    всё накопившееся, остальные находят outbox пустым. Письма, отложенные
+    после неудачи, подбирает её периодический запуск из ``JOBS_PERIODIC``.
+    """
+    owner = worker_id()
+    throttle = Throttle(settings.OUTBOX_RATE_LIMIT)
+    failed = 0
+    while True:
+        heartbeat()
+        rows = claim(owner, settings.OUTBOX_BATCH_SIZE)
+        if not rows:
+            break
+        failed += send_batch(rows, owner, throttle)
+    if failed:
+        raise DeliveryError(f'Не отправлено писем: {failed}')
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.invalidation import prune_change_log
+
+
+class Command(BaseCommand):
+    help = 'Удаляет из журнала изменений события старше срока хранения'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int,
+            default=settings.INVALIDATION_RETENTION,
+            help='Возраст событий в секундах, после которого они удаляются',
+        )
+
+    def handle(self, *args, **options):
+        deleted = prune_change_log(options['older_than'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено событий: {deleted}'))
@@ -0,0 +1,55 @@
+import multiprocessing
+import signal
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+def work(batch_size, poll_interval, once):
+    # Процессы запускаются через spawn: у каждого свои соединения с БД.
+    # Модуль команды импортируется в них до настройки Django, поэтому
+    # модели загружаются только здесь.
+    django.setup()
+    from core.jobs import Worker
+    Worker(batch_size, poll_interval).run(once=once)
+
+
+class Command(BaseCommand):
+    help = 'Запускает воркеры очереди фоновых задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Сколько процессов выполняют задачи')
+        parser.add_argument('--batch-size', type=int,
+                            default=settings.JOBS_BATCH_SIZE,
+                            help='Сколько задач воркер забирает за раз')
+        parser.add_argument('--poll-interval', type=float,
+                            default=settings.JOBS_POLL_INTERVAL,
+                            help='Пауза в секундах, когда очередь пуста')
+        parser.add_argument('--once', action='store_true',
+                            help='Выйти, когда готовых задач не останется')
+
+    def handle(self, *args, **options):
+        work_args = (options['batch_size'], options['poll_interval'],
+                     options['once'])
+        if options['processes'] == 1:
+            from core.jobs import Worker
+            Worker(*work_args[:2]).run(once=options['once'])
+            return
+        context = multiprocessing.get_context('spawn')
+        processes = [context.Process(target=work, args=work_args)
+                     for _ in range(options['processes'])]
+        for process in processes:
+            process.start()
+
+        def forward(signum, frame):
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+
+        signal.signal(signal.SIGTERM, forward)
+        signal.signal(signal.SIGINT, forward)
+        for process in processes:
+            process.join()
+        self.stdout.write(self.style.SUCCESS('Воркеры остановлены'))
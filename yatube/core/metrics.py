@@ -0,0 +1,248 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+BYTES_BUCKETS = tuple(2 ** power for power in range(20, 30, 2))
+VALUE_BUCKETS = tuple(2 ** power for power in range(12, 22, 2))
+LAG_BUCKETS = (0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600)
+
+METRICS = {
+    'queries': ('yatube_request_queries', QUERY_BUCKETS,
+                'SQL-запросов за запрос'),
+    'db_seconds': ('yatube_request_db_seconds', SECONDS_BUCKETS,
+                   'Время в БД за запрос'),
+    'render_seconds': ('yatube_request_render_seconds', SECONDS_BUCKETS,
+                       'Время рендеринга шаблонов за запрос'),
+    'wall_seconds': ('yatube_request_seconds', SECONDS_BUCKETS,
+                     'Полное время обработки запроса'),
+}
+
+# Метрики процесса, не привязанные к вьюхе.
+PROCESS_METRICS = {
+    'invalidation_lag': ('yatube_invalidation_lag_seconds', SECONDS_BUCKETS,
+                         'Задержка доставки событий инвалидации'),
+    'upload_image_bytes': ('yatube_upload_image_bytes', BYTES_BUCKETS,
+                           'Пик памяти под пиксели загруженной картинки'),
+    'job_lag': ('yatube_job_lag_seconds', LAG_BUCKETS,
+                'Ожидание фоновой задачи от срока запуска до начала'),
+    'job_seconds': ('yatube_job_seconds', SECONDS_BUCKETS,
+                    'Время выполнения фоновой задачи'),
+    'cache_dropped_bytes': ('yatube_cache_dropped_bytes', VALUE_BUCKETS,
+                            'Значения, не поместившиеся в слот кеша'),
+}
+# Мгновенные значения, которые считаются при каждом опросе.
+GAUGES = {
+    'ready': ('yatube_jobs_ready', 'Задач, готовых к выполнению'),
+    'scheduled': ('yatube_jobs_scheduled',
+                  'Задач, отложенных до срока запуска или повтора'),
+    'failed': ('yatube_jobs_failed', 'Задач, исчерпавших попытки'),
+    'lag_seconds': ('yatube_jobs_lag_seconds',
+                    'Возраст самой старой готовой задачи'),
+}
+PROCESS = '__process__'
+
+_lock = threading.Lock()
+_local = threading.local()
+_last_flush = time.monotonic()
+# (pid, имя файла снимка): время запуска в имени не даёт новому процессу
+# с тем же pid затереть снимок прежнего, а после fork имя выбирается
+# заново.
+_snapshot = (None, None)
+# view_name -> metric -> [счётчики по корзинам..., +Inf, сумма]
+_histograms = defaultdict(dict)
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db_seconds', 'render_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.render_seconds = 0.0
+
+
+def current():
+    """Статистика текущего запроса или None вне запроса."""
+    return getattr(_local, 'stats', None)
+
+
+def start():
+    _local.stats = RequestStats()
+    return _local.stats
+
+
+def finish():
+    _local.stats = None
+
+
+def _observe(view_name, metric, value):
+    buckets = (METRICS.get(metric) or PROCESS_METRICS[metric])[1]
+    row = _histograms[view_name].get(metric)
+    if row is None:
+        row = _histograms[view_name][metric] = [0] * (len(buckets) + 2)
+    for position, bound in enumerate(buckets):
+        if value <= bound:
+            row[position] += 1
+            break
+    else:
+        row[len(buckets)] += 1
+    row[-1] += value
+
+
+def record(view_name, stats, wall_seconds):
+    global _last_flush
+    with _lock:
+        _observe(view_name, 'queries', stats.queries)
+        _observe(view_name, 'db_seconds', stats.db_seconds)
+        _observe(view_name, 'render_seconds', stats.render_seconds)
+        _observe(view_name, 'wall_seconds', wall_seconds)
+        due = time.monotonic() - _last_flush >= settings.METRICS_FLUSH_INTERVAL
+        if due:
+            _last_flush = time.monotonic()
+            snapshot = json.dumps(_histograms)
+    if due:
+        _write_snapshot(snapshot)
+
+
+def observe(metric, value):
+    """Записать значение метрики процесса из ``PROCESS_METRICS``."""
+    with _lock:
+        _observe(PROCESS, metric, value)
+
+
+def _write_snapshot(snapshot):
+    """Атомарно записать гистограммы процесса в ``METRICS_DIR``."""
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=settings.METRICS_DIR,
+                                         suffix='.tmp')
+    with os.fdopen(handle, 'w') as temp_file:
+        temp_file.write(snapshot)
+    os.replace(temp_path, os.path.join(settings.METRICS_DIR,
+                                       _snapshot_name()))
+
+
+def _process_start(pid):
+    """Время запуска процесса или None, если процесса нет.
+
+    Вместе с pid отличает живой процесс от нового, получившего тот же
+    pid. Без ``/proc`` остаётся проверить только сам pid.
+    """
+    try:
+        with open(f'/proc/{pid}/stat') as stat:
+            # Имя процесса в скобках может содержать пробелы; starttime —
+            # 22-е поле, 20-е после скобки.
+            return stat.read().rsplit(')', 1)[1].split()[19]
+    except FileNotFoundError:
+        if os.path.isdir('/proc'):
+            return None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return None
+    except PermissionError:
+        pass
+    return '0'
+
+
+def _snapshot_name():
+    global _snapshot
+    pid = os.getpid()
+    if _snapshot[0] != pid:
+        _snapshot = (pid, f'metrics-{pid}-{_process_start(pid)}.json')
+    return _snapshot[1]
+
+
+def _snapshot_alive(name):
+    pid, _, start = name[len('metrics-'):-len('.json')].partition('-')
+    return pid.isdigit() and _process_start(int(pid)) == start
+
+
+def flush():
+    with _lock:
+        snapshot = json.dumps(_histograms)
+    _write_snapshot(snapshot)
+
+
+def collect():
+    """Сумма гистограмм всех живых процессов.
+
+    Снимок, чей процесс (pid и время запуска из имени файла) уже не
+    работает, оставил упавший или завершённый процесс: он удаляется и не
+    суммируется. Простаивающий процесс свой снимок не теряет.
+    """
+    flush()
+    total = defaultdict(dict)
+    for name in os.listdir(settings.METRICS_DIR):
+        if not (name.startswith('metrics-') and name.endswith('.json')):
+            continue
+        path = os.path.join(settings.METRICS_DIR, name)
+        try:
+            if not _snapshot_alive(name):
+                os.remove(path)
+                continue
+            with open(path) as snapshot:
+                histograms = json.load(snapshot)
+        except FileNotFoundError:
+            # Снимок удалил параллельный collect().
+            continue
+        for view_name, metrics in histograms.items():
+            for metric, row in metrics.items():
+                merged = total[view_name].setdefault(metric, [0] * len(row))
+                for position, value in enumerate(row):
+                    merged[position] += value
+    return total
+
+
+def _format_bound(bound):
+    return repr(float(bound)) if isinstance(bound, float) else str(bound)
+
+
+def render_prometheus(histograms):
+    lines = []
+    for metric, (name, buckets, help_text) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for view_name in sorted(histograms):
+            row = histograms[view_name].get(metric)
+            if row is None:
+                continue
+            label = view_name.replace('\\', '\\\\').replace('"', '\\"')
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), row[:-1]):
+                cumulative += count
+                lines.append(f'{name}_bucket{{view="{label}",'
+                             f'le="{_format_bound(bound)}"}} {cumulative}')
+            lines.append(f'{name}_sum{{view="{label}"}} {row[-1]}')
+            lines.append(f'{name}_count{{view="{label}"}} {cumulative}')
+    for metric, (name, buckets, help_text) in PROCESS_METRICS.items():
+        row = histograms.get(PROCESS, {}).get(metric)
+        if row is None:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        cumulative = 0
+        for bound, count in zip(buckets + ('+Inf',), row[:-1]):
+            cumulative += count
+            lines.append(f'{name}_bucket{{le="{_format_bound(bound)}"}} '
+                         f'{cumulative}')
+        lines.append(f'{name}_sum {row[-1]}')
+        lines.append(f'{name}_count {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+def render_gauges(values):
+    lines = []
+    for key, (name, help_text) in GAUGES.items():
+        if key not in values:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} gauge')
+        lines.append(f'{name} {values[key]}')
+    return '\n'.join(lines) + '\n'
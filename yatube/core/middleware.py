@@ -0,0 +1,108 @@
+import time
+
+from django.db import connections
+
+from . import metrics, page_cache
+from .invalidation import subscriber
+
+
+class QueryMetricsMiddleware:
+    """Собирает по каждой вьюхе число запросов к БД, время в БД,
+    время рендеринга шаблонов и полное время ответа.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = metrics.start()
+        started = time.perf_counter()
+        try:
+            with _ExecuteWrappers(stats):
+                response = self.get_response(request)
+        finally:
+            metrics.finish()
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else 'unresolved'
+        metrics.record(view_name, stats, time.perf_counter() - started)
+        return response
+
+
+class _ExecuteWrappers:
+    def __init__(self, stats):
+        self.stats = stats
+        self.contexts = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.stats.queries += 1
+            self.stats.db_seconds += time.perf_counter() - started
+
+    def __enter__(self):
+        for connection in connections.all():
+            wrapper = connection.execute_wrapper(self)
+            wrapper.__enter__()
+            self.contexts.append(wrapper)
+
+    def __exit__(self, *exc_info):
+        while self.contexts:
+            self.contexts.pop().__exit__(*exc_info)
+
+
+class InvalidationMiddleware:
+    """Перед запросом дочитывает журнал изменений, чтобы кеши процесса
+    не отдавали устаревшие данные.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        subscriber.poll_if_due()
+        return self.get_response(request)
+
+
+class AnonymousPageCacheMiddleware:
+    """Кеш целых ответов для анонимных посетителей.
+
+    Свежая страница отдаётся из кеша без вьюхи. Устаревшую (по времени
+    или по версии из ``PAGE_CACHE_VERSION``) пересобирает один запрос,
+    а остальные тем временем получают прежнюю копию. Если копии нет
+    совсем, остальные ждут сборщика, а не рендерят ту же страницу сами.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        rebuild = getattr(request, '_page_cache_rebuild', None)
+        if rebuild is not None:
+            key, version = rebuild
+            try:
+                if page_cache.cacheable(response):
+                    page_cache.store(key, version, response)
+            finally:
+                page_cache.release(key)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not page_cache.applies(request):
+            return None
+        key = page_cache.page_key(request)
+        version = page_cache.current_version()
+        entry = page_cache.get(key)
+        if entry is not None and page_cache.is_fresh(entry, version):
+            return page_cache.respond(request, entry, 'hit')
+        if page_cache.acquire(key):
+            request._page_cache_rebuild = (key, version)
+            return None
+        if entry is not None:
+            return page_cache.respond(request, entry, 'stale')
+        entry = page_cache.wait_for(key, version)
+        if entry is not None:
+            return page_cache.respond(request, entry, 'hit')
+        return None
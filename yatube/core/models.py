@@ -0,0 +1,88 @@
+from django.db import models
+
+
+class ChangeEvent(models.Model):
+    """Запись журнала изменений для шины инвалидации.
+
+    Журнал только дополняется: воркеры читают его по возрастанию ``id``,
+    старые записи удаляет периодическая фоновая задача
+    ``prune_change_log``.
+    """
+
+    tag = models.CharField(max_length=150)
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ('id',)
+
+    def __str__(self):
+        return self.tag
+
+
+class StoredFile(models.Model):
+    """Счётчик ссылок на файл в хранилище с адресацией по содержимому.
+
+    Одинаковые загрузки лежат на диске одним файлом; он удаляется, когда
+    на него не остаётся ссылок.
+    """
+
+    name = models.CharField(max_length=255, primary_key=True)
+    refs = models.PositiveIntegerField(default=0)
+    size = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.name
+
+
+class Job(models.Model):
+    """Фоновая задача в очереди ``run_workers``.
+
+    Выполненные задачи удаляются; исчерпавшие попытки остаются в
+    состоянии ``failed`` с последней ошибкой.
+    """
+
+    PENDING = 'pending'
+    FAILED = 'failed'
+    STATES = ((PENDING, 'В очереди'), (FAILED, 'Ошибка'))
+
+    task = models.CharField(max_length=200)
+    args = models.TextField(default='[]')
+    state = models.CharField(max_length=10, choices=STATES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=1)
+    run_at = models.DateTimeField()
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('run_at', 'id')
+        indexes = [models.Index(fields=['state', 'run_at'],
+                                name='job_state_run_at_idx')]
+
+    def __str__(self):
+        return f'{self.task} #{self.pk}'
+
+
+class OutboxMessage(models.Model):
+    """Письмо, ожидающее отправки задачей ``deliver_outbox``.
+
+    Отправленные письма удаляются; письма, исчерпавшие попытки,
+    остаются с последней ошибкой.
+    """
+
+    subject = models.CharField(max_length=255)
+    recipients = models.TextField()
+    payload = models.BinaryField()
+    attempts = models.PositiveIntegerField(default=0)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('id',)
+
+    def __str__(self):
+        return f'{self.subject} → {self.recipients}'
@@ -0,0 +1,108 @@
+import hashlib
+import time
+import zlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.module_loading import import_string
+
+CACHE_ALIAS = 'pages'
+
+# Запись кеша: (версия, время рендера, статус, Content-Type, сжатое тело,
+# заголовки валидации).
+VERSION, CREATED, STATUS, CONTENT_TYPE, BODY, HEADERS = range(6)
+# Номер формата записи в ключе: файл кеша переживает перезапуски.
+ENTRY_FORMAT = 2
+STORED_HEADERS = ('ETag', 'Last-Modified', 'Vary')
+
+
+def applies(request):
+    """Кешируются только анонимные GET/HEAD страниц из
+    ``PAGE_CACHE_VIEWS``: авторизованным страница собирается своя.
+    """
+    match = request.resolver_match
+    return (request.method in ('GET', 'HEAD')
+            and match is not None
+            and match.view_name in settings.PAGE_CACHE_VIEWS
+            and not request.user.is_authenticated)
+
+
+def current_version():
+    return import_string(settings.PAGE_CACHE_VERSION)()
+
+
+def page_key(request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'page:{ENTRY_FORMAT}:{path}'
+
+
+def is_fresh(entry, version):
+    return (entry[VERSION] == version
+            and time.time() - entry[CREATED] < settings.PAGE_CACHE_TIMEOUT)
+
+
+def get(key):
+    return caches[CACHE_ALIAS].get(key)
+
+
+def cacheable(response):
+    return (response.status_code == 200
+            and not response.streaming
+            and not response.cookies)
+
+
+def store(key, version, response):
+    headers = {name: response[name] for name in STORED_HEADERS
+               if response.has_header(name)}
+    entry = (version, time.time(), response.status_code,
+             response['Content-Type'], zlib.compress(response.content),
+             headers)
+    # Запись живёт дольше свежести: столько её можно отдавать
+    # устаревшей, пока страница пересобирается.
+    caches[CACHE_ALIAS].set(key, entry, settings.PAGE_CACHE_STALE_TIMEOUT)
+
+
+def acquire(key):
+    """Взять право пересобрать страницу: его получает ровно один запрос."""
+    return caches[CACHE_ALIAS].add(f'{key}:lock', 1,
+                                   settings.PAGE_CACHE_LOCK_TIMEOUT)
+
+
+def release(key):
+    caches[CACHE_ALIAS].delete(f'{key}:lock')
+
+
+def wait_for(key, version):
+    """Дождаться страницы, которую собирает другой запрос.
+
+    None, если сборщик не успел за ``PAGE_CACHE_WAIT`` секунд или
+    снял блокировку, ничего не записав.
+    """
+    cache = caches[CACHE_ALIAS]
+    deadline = time.monotonic() + settings.PAGE_CACHE_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.01)
+        entry = cache.get(key)
+        if entry is not None and entry[VERSION] == version:
+            return entry
+        if not cache.has_key(f'{key}:lock'):
+            return None
+    return None
+
+
+def respond(request, entry, state):
+    """Ответ из записи кеша; 304, если у клиента та же версия."""
+    headers = entry[HEADERS]
+    response = get_conditional_response(
+        request, etag=headers.get('ETag'), response=None)
+    if response is None:
+        response = HttpResponse(zlib.decompress(entry[BODY]),
+                                status=entry[STATUS],
+                                content_type=entry[CONTENT_TYPE])
+    for name, value in headers.items():
+        response[name] = value
+    response['Age'] = int(max(time.time() - entry[CREATED], 0))
+    response['X-Page-Cache'] = state
+    return response
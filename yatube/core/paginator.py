@@ -0,0 +1,130 @@
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по упорядоченному набору полей.
+
+    Страницы выбираются условием ``WHERE (pub_date, id) < cursor`` вместо
+    ``OFFSET``, поэтому глубокие страницы стоят столько же, сколько первая,
+    и для построения ссылок не нужен ``COUNT(*)``. Поля ``ordering``
+    должны однозначно задавать порядок и сортироваться в одну сторону.
+    """
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-id'), **kwargs):
+        self.ordering = tuple(ordering)
+        self.fields = tuple(field.lstrip('-') for field in self.ordering)
+        self.descending = self.ordering[0].startswith('-')
+        super().__init__(object_list.order_by(*self.ordering), per_page,
+                         **kwargs)
+
+    def encode_cursor(self, obj):
+        values = [getattr(obj, field) for field in self.fields]
+        data = json.dumps(values, default=str).encode()
+        return urlsafe_base64_encode(data)
+
+    def decode_cursor(self, token):
+        """Вернуть значения полей курсора или None для битого токена."""
+        try:
+            values = json.loads(urlsafe_base64_decode(token).decode())
+            if len(values) != len(self.fields):
+                return None
+            model_meta = self.object_list.model._meta
+            return [model_meta.get_field(field).to_python(value)
+                    for field, value in zip(self.fields, values)]
+        except (ValueError, TypeError, ValidationError):
+            return None
+
+    def _keyset_filter(self, values, forward, fields=None):
+        """Условие «после курсора» (или «до» при ``forward=False``);
+        ``fields`` переименовывает поля курсора для другой таблицы.
+        """
+        fields = fields or self.fields
+        lookup = 'lt' if self.descending == forward else 'gt'
+        condition = Q()
+        for position, field in enumerate(fields):
+            step = Q(**{f'{field}__{lookup}': values[position]})
+            for prev_field, prev_value in zip(fields[:position],
+                                              values[:position]):
+                step &= Q(**{prev_field: prev_value})
+            condition |= step
+        # Нестрогая граница по первому полю превращает OR в диапазон
+        # одного индекса, без MULTI-INDEX OR и сортировки.
+        return Q(**{f'{fields[0]}__{lookup}e': values[0]}) & condition
+
+    def _reversed_ordering(self, ordering=None):
+        return [field[1:] if field.startswith('-') else f'-{field}'
+                for field in ordering or self.ordering]
+
+    def window(self, values, forward, limit):
+        """До ``limit`` объектов после курсора ``values`` (с начала при
+        ``None``) в порядке обхода: при ``forward=False`` — к началу.
+        """
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(self._keyset_filter(values, forward))
+        if not forward:
+            queryset = queryset.order_by(*self._reversed_ordering())
+        return list(queryset[:limit])
+
+    def _make_page(self, object_list, number, previous_cursor, next_cursor):
+        page = Page(object_list, number, self)
+        page.previous_cursor = previous_cursor
+        page.next_cursor = next_cursor
+        page.cursor = (self.encode_cursor(object_list[0])
+                       if number != 1 and object_list else '')
+        return page
+
+    def first_page(self):
+        return self.page_after(None)
+
+    def page_after(self, values):
+        rows = self.window(values, True, self.per_page + 1)
+        object_list = rows[:self.per_page]
+        next_cursor = (self.encode_cursor(object_list[-1])
+                       if len(rows) > self.per_page else None)
+        if values is None or not object_list:
+            return self._make_page(object_list, 1, None, next_cursor)
+        return self._make_page(object_list, None,
+                               self.encode_cursor(object_list[0]),
+                               next_cursor)
+
+    def page_before(self, values):
+        rows = self.window(values, False, self.per_page + 1)
+        if len(rows) <= self.per_page:
+            # Впереди меньше целой страницы: это и есть начало ленты.
+            return self.first_page()
+        object_list = rows[:self.per_page][::-1]
+        return self._make_page(object_list, None,
+                               self.encode_cursor(object_list[0]),
+                               self.encode_cursor(object_list[-1]))
+
+    def get_cursor_page(self, params):
+        """Страница по параметрам запроса ``after``/``before``/``page``.
+
+        Устаревший ``?page=N`` по-прежнему работает через OFFSET, но
+        ссылки с такой страницы уже ведут на курсоры.
+        """
+        for key, handler in (('after', self.page_after),
+                             ('before', self.page_before)):
+            token = params.get(key)
+            if token:
+                values = self.decode_cursor(token)
+                if values is None:
+                    return self.first_page()
+                return handler(values)
+        if params.get('page'):
+            page = self.get_page(params.get('page'))
+            object_list = list(page.object_list)
+            previous_cursor = (self.encode_cursor(object_list[0])
+                               if page.has_previous() else None)
+            next_cursor = (self.encode_cursor(object_list[-1])
+                           if page.has_next() else None)
+            return self._make_page(object_list, page.number,
+                                   previous_cursor, next_cursor)
+        return self.first_page()
@@ -0,0 +1,95 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+from .models import StoredFile
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Файлы именуются по SHA-256 содержимого: ``posts/ab/cd/<sha>.jpg``.
+
+    Две буквы на уровень дают не больше 256 подкаталогов на каталог при
+    любом числе файлов. Повторная загрузка того же содержимого не пишет
+    файл заново, а добавляет ссылку в ``StoredFile``; ``release`` убирает
+    ссылку и удаляет файл вместе с последней.
+    """
+
+    def hashed_name(self, name, digest):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest[:2], digest[2:4],
+                            digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = hashlib.sha256()
+        size = 0
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+            size += len(chunk)
+        name = self.hashed_name(name, digest.hexdigest())
+        if not self.exists(name):
+            self._write(name, content)
+        self.retain(name, size)
+        return name.replace('\\', '/')
+
+    def _write(self, name, content):
+        # Одно и то же содержимое могут писать параллельно: каждый пишет
+        # во временный файл и атомарно переименовывает его в итоговый.
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+        try:
+            with os.fdopen(handle, 'wb') as temp_file:
+                content.seek(0)
+                for chunk in content.chunks():
+                    temp_file.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def retain(self, name, size=0):
+        updated = StoredFile.objects.filter(name=name).update(
+            refs=F('refs') + 1)
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                StoredFile.objects.create(name=name, refs=1, size=size)
+        except IntegrityError:
+            StoredFile.objects.filter(name=name).update(refs=F('refs') + 1)
+
+    def release(self, name):
+        """Убрать ссылку на файл; файл без ссылок удаляется после коммита.
+
+        Файлы, которых нет в ``StoredFile`` (загруженные до перехода на
+        это хранилище), не трогаются.
+        """
+        updated = StoredFile.objects.filter(name=name, refs__gt=1).update(
+            refs=F('refs') - 1)
+        if updated:
+            return
+        deleted, _ = StoredFile.objects.filter(name=name).delete()
+        if deleted:
+            transaction.on_commit(lambda: self._delete_unreferenced(name))
+
+    def _delete_unreferenced(self, name):
+        # Пока транзакция шла, тот же файл могли загрузить снова.
+        if not StoredFile.objects.filter(name=name).exists():
+            self.delete(name)
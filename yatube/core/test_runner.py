@@ -0,0 +1,50 @@
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+@contextmanager
+def isolated_runtime_dir():
+    """Кеши в памяти и метрики — во временном каталоге прогона.
+
+    Иначе ``cache.clear()`` в тестах стирал бы кеш сайта, запущенного на
+    том же хосте, а записи тестов и сайта портили бы друг друга.
+    Переменная окружения нужна процессам, которые запускает сам тест.
+    """
+    runtime_dir = tempfile.mkdtemp(prefix='yatube-test-')
+    previous = os.environ.get('YATUBE_RUNTIME_DIR')
+    os.environ['YATUBE_RUNTIME_DIR'] = runtime_dir
+    caches = {
+        alias: {**config, 'LOCATION': os.path.join(
+            runtime_dir, os.path.basename(config['LOCATION']))}
+        for alias, config in settings.CACHES.items()
+    }
+    try:
+        with override_settings(
+                RUNTIME_DIR=runtime_dir, CACHES=caches,
+                METRICS_DIR=os.path.join(runtime_dir, 'yatube_metrics')):
+            yield runtime_dir
+    finally:
+        if previous is None:
+            os.environ.pop('YATUBE_RUNTIME_DIR', None)
+        else:
+            os.environ['YATUBE_RUNTIME_DIR'] = previous
+        shutil.rmtree(runtime_dir, ignore_errors=True)
+
+
+class TestRunner(DiscoverRunner):
+    """``manage.py test`` со своим каталогом для кешей и метрик."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._runtime_dir = isolated_runtime_dir()
+        self._runtime_dir.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self._runtime_dir.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
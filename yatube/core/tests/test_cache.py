@@ -0,0 +1,119 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from .. import metrics
+from ..cache import SharedMemoryCache
+
+TEMP_CACHE_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_cache(name, **options):
+    return SharedMemoryCache(os.path.join(TEMP_CACHE_DIR, name), {
+        'OPTIONS': {'SLOTS': 64, 'SLOT_SIZE': 256, **options},
+    })
+
+
+def write_from_child(name):
+    make_cache(name).set('from_child', 'привет')
+
+
+class SharedMemoryCacheTests(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_CACHE_DIR, ignore_errors=True)
+
+    def test_basic_api(self):
+        """Основные операции кеша Django"""
+        cache = make_cache('basic')
+        cache.set('key', {'value': 1})
+        self.assertEqual(cache.get('key'), {'value': 1})
+        self.assertFalse(cache.add('key', 2))
+        self.assertTrue(cache.add('other', 2))
+        self.assertEqual(cache.get_many(['key', 'other', 'missing']),
+                         {'key': {'value': 1}, 'other': 2})
+        self.assertEqual(cache.set_many({'a': 1, 'b': os.urandom(1000)}),
+                         ['b'])
+        self.assertEqual(cache.incr('a', 5), 6)
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+        cache.delete_many(['a', 'other'])
+        self.assertFalse(cache.has_key('a'))
+        cache.clear()
+        self.assertIsNone(cache.get('key'))
+
+    def test_versions_and_patterns(self):
+        """Версии ключей и удаление по шаблону"""
+        cache = make_cache('versions')
+        cache.set('feed:1', 'a')
+        cache.set('feed:2', 'b')
+        cache.set('user:1', 'c')
+        self.assertEqual(cache.incr_version('user:1'), 2)
+        self.assertEqual(cache.get('user:1', version=2), 'c')
+        self.assertEqual(cache.delete_pattern('feed:*'), 2)
+        self.assertIsNone(cache.get('feed:1'))
+
+    def test_expiry(self):
+        """Просроченные записи не отдаются"""
+        cache = make_cache('expiry')
+        cache.set('short', 1, timeout=0.05)
+        cache.set('long', 1)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('short'))
+        self.assertTrue(cache.touch('long', 0))
+        self.assertIsNone(cache.get('long'))
+
+    def test_eviction_keeps_recent_keys(self):
+        """При переполнении вытесняются записи, а не новые ключи"""
+        cache = make_cache('eviction', PROBES=4)
+        for number in range(200):
+            cache.set(f'key{number}', number)
+        self.assertEqual(cache.get('key199'), 199)
+        stored = sum(cache.has_key(f'key{number}') for number in range(200))
+        self.assertLessEqual(stored, 64)
+
+    def test_large_fragment_compressed(self):
+        """Фрагмент ленты крупнее слота хранится сжатым"""
+        cache = make_cache('fragment', SLOT_SIZE=4096)
+        fragment = ''.join(
+            f'<article class="card mb-3"><div class="card-body">'
+            f'<p class="card-text">Пост номер {number}: заметки о '
+            f'погоде, книгах и прогулках по городу.</p>'
+            f'<a href="/profile/author{number}/">author{number}</a>'
+            f'<a class="btn btn-sm" href="/posts/{number}/">Подробнее</a>'
+            f'</div></article>'
+            for number in range(20)
+        )
+        self.assertGreater(len(fragment.encode()), 6000)
+        cache.set('index_page', fragment)
+        self.assertEqual(cache.get('index_page'), fragment)
+        self.assertEqual(cache.get_many(['index_page']),
+                         {'index_page': fragment})
+
+    def test_dropped_value_logged(self):
+        """Несжимаемое значение крупнее слота не кешируется, но это
+        видно в логе и метрике"""
+        cache = make_cache('dropped')
+        metrics._histograms.clear()
+        with self.assertLogs('core.cache', 'WARNING'):
+            cache.set('noise', os.urandom(1000))
+        self.assertIsNone(cache.get('noise'))
+        self.assertEqual(
+            sum(metrics._histograms[metrics.PROCESS][
+                'cache_dropped_bytes'][:-1]), 1)
+
+    def test_shared_between_processes(self):
+        """Запись из другого процесса видна сразу"""
+        cache = make_cache('shared')
+        cache.get('warm')
+        process = multiprocessing.get_context('fork').Process(
+            target=write_from_child, args=('shared',))
+        process.start()
+        process.join()
+        self.assertEqual(cache.get('from_child'), 'привет')
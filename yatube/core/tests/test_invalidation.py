@@ -0,0 +1,85 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .. import metrics
+from ..invalidation import LocalCache, Subscriber, publish
+from ..models import ChangeEvent
+
+
+class LocalCacheTests(TestCase):
+    def test_tags_evict_entries(self):
+        """Тег вытесняет все помеченные им записи"""
+        cache = LocalCache(maxsize=10)
+        cache.set('a', 1, ('user:1',))
+        cache.set('b', 2, ('user:1', 'group:1'))
+        cache.set('c', 3, ('group:2',))
+        cache.invalidate('user:1')
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+        self.assertNotIn('group:1', cache.keys_by_tag)
+
+    def test_lru_limit(self):
+        """Сверх лимита вытесняются давно не читанные записи"""
+        cache = LocalCache(maxsize=2)
+        cache.set('a', 1, ('t:a',))
+        cache.set('b', 2, ('t:b',))
+        cache.get('a')
+        cache.set('c', 3, ('t:c',))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+
+
+class SubscriberTests(TestCase):
+    def setUp(self):
+        metrics._histograms.clear()
+        self.cache = LocalCache(maxsize=10)
+        self.subscriber = Subscriber()
+        self.subscriber.poll()
+
+    def test_publish_evicts_in_own_process(self):
+        """Свой процесс чистит кеш сразу при публикации"""
+        self.cache.set('key', 1, ('post:1',))
+        publish('post:1')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(ChangeEvent.objects.filter(tag='post:1').exists())
+
+    def test_poll_delivers_foreign_events(self):
+        """События другого процесса доходят при опросе журнала"""
+        self.cache.set('key', 1, ('post:1',))
+        self.cache.set('other', 2, ('post:2',))
+        ChangeEvent.objects.create(tag='post:1')
+        self.assertEqual(self.subscriber.poll(), 1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get('other'), 2)
+        self.assertEqual(self.subscriber.poll(), 0)
+        lag = metrics._histograms[metrics.PROCESS]['invalidation_lag']
+        self.assertEqual(sum(lag[:-1]), 1)
+
+    @override_settings(INVALIDATION_BATCH_SIZE=2)
+    def test_poll_reads_all_batches(self):
+        """Опрос дочитывает журнал пачками до конца"""
+        ChangeEvent.objects.bulk_create(
+            ChangeEvent(tag=f'post:{number}') for number in range(5))
+        self.assertEqual(self.subscriber.poll(), 5)
+
+    @override_settings(INVALIDATION_RETENTION=0)
+    def test_stale_subscriber_clears_caches(self):
+        """Отставший дольше срока хранения процесс сбрасывает кеши"""
+        self.cache.set('key', 1, ('post:1',))
+        self.subscriber.poll()
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_prune_change_log(self):
+        """Команда удаляет только старые события"""
+        old = ChangeEvent.objects.create(tag='post:1')
+        ChangeEvent.objects.filter(pk=old.pk).update(
+            created=timezone.now() - timedelta(hours=2))
+        ChangeEvent.objects.create(tag='post:2')
+        call_command('prune_change_log', older_than=3600, stdout=StringIO())
+        self.assertEqual(list(ChangeEvent.objects.values_list(
+            'tag', flat=True)), ['post:2'])
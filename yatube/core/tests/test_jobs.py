@@ -0,0 +1,155 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .. import metrics
+from ..jobs import (Worker, claim, execute, heartbeat, queue_stats,
+                    renew, schedule_periodic, task)
+from ..models import Job
+
+calls = []
+
+
+@task
+def remember(value):
+    calls.append(value)
+
+
+@task(max_attempts=2)
+def explode():
+    raise RuntimeError('сбой')
+
+
+@task
+def stolen_midway():
+    """Длинная задача, которую между кусками забрал другой воркер."""
+    heartbeat()
+    calls.append('первый кусок')
+    Job.objects.update(locked_by='w2')
+    heartbeat()
+    calls.append('второй кусок')
+
+
+@override_settings(JOBS_RETRY_DELAY=10, JOBS_RETRY_MAX_DELAY=60)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+        metrics._histograms.clear()
+
+    def test_worker_runs_and_deletes_jobs(self):
+        """Воркер выполняет задачи из очереди и удаляет выполненные"""
+        remember.delay('a')
+        remember.delay('b')
+        Worker(batch_size=1).run(once=True)
+        self.assertEqual(calls, ['a', 'b'])
+        self.assertFalse(Job.objects.exists())
+        lag = metrics._histograms[metrics.PROCESS]['job_lag']
+        self.assertEqual(sum(lag[:-1]), 2)
+
+    def test_direct_call(self):
+        """Задача вызывается и напрямую, без очереди"""
+        remember('c')
+        self.assertEqual(calls, ['c'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_retry_with_backoff_then_fail(self):
+        """Упавшая задача откладывается, после последней попытки — failed"""
+        job = explode.delay()
+        [claimed] = claim('w1', 10)
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.assertFalse(execute(claimed, 'w1'))
+        job.refresh_from_db()
+        self.assertEqual(job.state, Job.PENDING)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.locked_by, '')
+        self.assertIn('RuntimeError', job.last_error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=9))
+        self.assertEqual(claim('w1', 10), [])
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        [claimed] = claim('w1', 10)
+        with self.assertLogs('core.jobs', 'ERROR'):
+            execute(claimed, 'w1')
+        job.refresh_from_db()
+        self.assertEqual(job.state, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_claim_batches_do_not_overlap(self):
+        """Воркеры забирают разные задачи; брошенные по сроку блокировки
+        возвращаются в очередь
+        """
+        for value in range(5):
+            remember.delay(value)
+        first = claim('w1', 3)
+        second = claim('w2', 3)
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 2)
+        self.assertFalse({job.pk for job in first}
+                         & {job.pk for job in second})
+        self.assertEqual(claim('w3', 3), [])
+        Job.objects.filter(locked_by='w1').update(
+            locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(len(claim('w3', 3)), 3)
+
+    def test_heartbeat_extends_lease(self):
+        """heartbeat продлевает блокировку, а потерянная прерывает задачу"""
+        job = stolen_midway.delay()
+        [claimed] = claim('w1', 10)
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now())
+        with self.assertLogs('core.jobs', 'WARNING'):
+            self.assertFalse(execute(claimed, 'w1'))
+        self.assertEqual(calls, ['первый кусок'])
+        job.refresh_from_db()
+        self.assertEqual(job.locked_by, 'w2')
+        self.assertGreater(job.locked_until,
+                           timezone.now() + timedelta(minutes=4))
+
+    def test_batch_skips_jobs_taken_over(self):
+        """Задачу пачки, которую уже забрал другой воркер, воркер не
+        выполняет повторно
+        """
+        remember.delay('a')
+        remember.delay('b')
+        worker = Worker(batch_size=2)
+        first, second = claim(worker.id, 2)
+        Job.objects.filter(pk=second.pk).update(locked_by='w2')
+        with mock.patch('core.jobs.claim', return_value=[first, second]):
+            worker.run_batch()
+        self.assertEqual(calls, ['a'])
+        self.assertFalse(renew(second.pk, worker.id))
+        self.assertTrue(Job.objects.filter(pk=second.pk).exists())
+
+    @override_settings(JOBS_PERIODIC={
+        'core.invalidation.prune_change_log': 60})
+    def test_periodic_jobs_scheduled_once_per_interval(self):
+        """Периодическая задача ставится раз в интервал, сколько бы
+        воркеров ни проверяло срок
+        """
+        cache.delete('core:jobs:periodic:core.invalidation.prune_change_log')
+        for _ in range(3):
+            schedule_periodic()
+        self.assertEqual(Job.objects.filter(
+            task='core.invalidation.prune_change_log').count(), 1)
+
+    def test_queue_stats(self):
+        """Глубина очереди делится на готовые, отложенные и упавшие"""
+        remember.delay(1)
+        Job.objects.filter(pk=remember.delay(2).pk).update(
+            run_at=timezone.now() + timedelta(hours=1))
+        Job.objects.filter(pk=remember.delay(3).pk).update(state=Job.FAILED)
+        stats = queue_stats()
+        self.assertEqual(
+            (stats['ready'], stats['scheduled'], stats['failed']), (1, 1, 1))
+        self.assertGreaterEqual(stats['lag_seconds'], 0)
+        self.assertIn('yatube_jobs_ready 1', metrics.render_gauges(stats))
+
+    def test_run_workers_command(self):
+        """run_workers --once вычерпывает очередь и выходит"""
+        remember.delay('x')
+        call_command('run_workers', processes=1, once=True,
+                     stdout=StringIO())
+        self.assertEqual(calls, ['x'])
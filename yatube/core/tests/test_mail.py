@@ -0,0 +1,109 @@
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..jobs import Worker, schedule_periodic
+from ..mail import DeliveryError, deliver_outbox
+from ..models import Job, OutboxMessage
+
+User = get_user_model()
+
+
+class CountingBackend(EmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return True
+
+
+class FailingBackend(EmailBackend):
+    def send_messages(self, messages):
+        if any('bad@example.com' in message.to for message in messages):
+            raise ConnectionError('отказ сервера')
+        return super().send_messages(messages)
+
+
+@override_settings(
+    EMAIL_BACKEND='core.mail.OutboxBackend',
+    OUTBOX_EMAIL_BACKEND='core.tests.test_mail.CountingBackend',
+    OUTBOX_BATCH_SIZE=2,
+    OUTBOX_RATE_LIMIT=0,
+)
+class OutboxTests(TestCase):
+    def setUp(self):
+        CountingBackend.opened = 0
+
+    def test_send_mail_queues_message(self):
+        """send_mail кладёт письмо в outbox и ставит задачу отправки"""
+        mail.send_mail('Тема', 'Текст', 'from@example.com',
+                       ['to@example.com'])
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboxMessage.objects.get().recipients,
+                         'to@example.com')
+        self.assertEqual(Job.objects.get().task, deliver_outbox.name)
+
+    def test_batches_share_connection(self):
+        """Письма уходят пачками, одно соединение на пачку"""
+        for number in range(5):
+            mail.send_mail(f'Письмо {number}', 'Текст', 'from@example.com',
+                           [f'user{number}@example.com'])
+        Worker().run(once=True)
+        self.assertEqual([message.subject for message in mail.outbox],
+                         [f'Письмо {number}' for number in range(5)])
+        self.assertEqual(CountingBackend.opened, 3)
+        self.assertFalse(OutboxMessage.objects.exists())
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(
+        OUTBOX_EMAIL_BACKEND='core.tests.test_mail.FailingBackend')
+    def test_failed_message_deferred(self):
+        """Неотправленное письмо откладывается, остальные уходят"""
+        mail.send_mail('Плохое', 'Текст', 'from@example.com',
+                       ['bad@example.com'])
+        mail.send_mail('Хорошее', 'Текст', 'from@example.com',
+                       ['good@example.com'])
+        with self.assertRaises(DeliveryError):
+            deliver_outbox()
+        self.assertEqual([message.subject for message in mail.outbox],
+                         ['Хорошее'])
+        failed = OutboxMessage.objects.get()
+        self.assertEqual(failed.attempts, 1)
+        self.assertIn('ConnectionError', failed.last_error)
+        deliver_outbox()
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_deferred_message_delivered_later(self):
+        """Отложенное письмо уходит при периодическом запуске отправки,
+        когда задача, на которой оно упало, уже закончилась"""
+        with override_settings(
+                OUTBOX_EMAIL_BACKEND='core.tests.test_mail.FailingBackend'):
+            mail.send_mail('Плохое', 'Текст', 'from@example.com',
+                           ['bad@example.com'])
+            with self.assertRaises(DeliveryError):
+                deliver_outbox()
+        Job.objects.all().delete()
+        OutboxMessage.objects.update(locked_until=None)
+        cache.delete('core:jobs:periodic:core.mail.deliver_outbox')
+        schedule_periodic()
+        Worker().run(once=True)
+        self.assertEqual([message.subject for message in mail.outbox],
+                         ['Плохое'])
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_password_reset_not_sent_inline(self):
+        """Письмо сброса пароля не отправляется во время запроса"""
+        User.objects.create_user(username='reader',
+                                 email='reader@example.com',
+                                 password='secret-password')
+        response = self.client.post(reverse('users:password_reset'),
+                                    {'email': 'reader@example.com'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboxMessage.objects.get().recipients,
+                         'reader@example.com')
+        deliver_outbox()
+        self.assertEqual(len(mail.outbox), 1)
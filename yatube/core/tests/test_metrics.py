@@ -0,0 +1,84 @@
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import metrics
+
+TEMP_METRICS_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+
+@override_settings(METRICS_DIR=TEMP_METRICS_DIR)
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.user = User.objects.create_user(username='user')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_METRICS_DIR, ignore_errors=True)
+
+    def setUp(self):
+        metrics._histograms.clear()
+        caches['pages'].clear()
+        self.client = Client()
+
+    def test_view_metrics_recorded(self):
+        """Запрос к вьюхе попадает в гистограммы"""
+        self.client.get(reverse('posts:index'))
+        recorded = metrics.collect()['posts:index']
+        self.assertEqual(set(recorded), set(metrics.METRICS))
+        self.assertGreater(recorded['queries'][-1], 0)
+        self.assertGreater(recorded['render_seconds'][-1], 0)
+
+    def test_metrics_endpoint_for_staff_only(self):
+        """Метрики в формате Prometheus отдаются только персоналу"""
+        self.client.get(reverse('posts:index'))
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('core:metrics'))
+        self.assertNotEqual(response.status_code, 200)
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('core:metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(
+            response, 'yatube_request_queries_count{view="posts:index"} 1')
+        self.assertContains(response, '# TYPE yatube_request_seconds '
+                                      'histogram')
+
+    def test_dead_process_snapshots_expire(self):
+        """Снимок завершённого процесса удаляется и не суммируется, а
+        снимок простаивающего живого процесса остаётся, как бы давно он
+        ни обновлялся"""
+        child = multiprocessing.get_context('fork').Process(target=int)
+        child.start()
+        child.join()
+        parent = os.getppid()
+        snapshots = {
+            'dead': f'metrics-{child.pid}-1.json',
+            'reused_pid': f'metrics-{parent}-1.json',
+            'idle': f'metrics-{parent}-{metrics._process_start(parent)}.json',
+        }
+        long_ago = time.time() - 24 * 60 * 60
+        for view_name, name in snapshots.items():
+            path = os.path.join(TEMP_METRICS_DIR, name)
+            with open(path, 'w') as snapshot:
+                json.dump({view_name: {'queries': [1] * 20}}, snapshot)
+            os.utime(path, (long_ago, long_ago))
+        self.assertEqual(set(metrics.collect()) & set(snapshots), {'idle'})
+        remaining = os.listdir(TEMP_METRICS_DIR)
+        self.assertNotIn(snapshots['dead'], remaining)
+        self.assertNotIn(snapshots['reused_pid'], remaining)
+        self.assertIn(snapshots['idle'], remaining)
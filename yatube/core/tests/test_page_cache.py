@@ -0,0 +1,67 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+from .. import page_cache
+
+User = get_user_model()
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.create(author=cls.author, text='Первый пост')
+
+    def setUp(self):
+        cache.clear()
+        caches['pages'].clear()
+        self.client = Client()
+        self.url = reverse('posts:index')
+        self.key = page_cache.page_key(RequestFactory().get(self.url))
+
+    def test_second_request_is_hit(self):
+        """Повторный анонимный запрос обходится без вьюхи"""
+        first = self.client.get(self.url)
+        second = self.client.get(self.url)
+        self.assertFalse(first.has_header('X-Page-Cache'))
+        self.assertEqual(second['X-Page-Cache'], 'hit')
+        self.assertEqual(first.content, second.content)
+
+    def test_new_post_invalidates_page(self):
+        """Новый пост меняет версию, и страница собирается заново"""
+        self.client.get(self.url)
+        Post.objects.create(author=self.author, text='Свежий пост')
+        response = self.client.get(self.url)
+        self.assertFalse(response.has_header('X-Page-Cache'))
+        self.assertContains(response, 'Свежий пост')
+
+    def test_authorized_user_not_cached(self):
+        """Авторизованному страница собирается своя"""
+        self.client.get(self.url)
+        self.client.force_login(self.author)
+        response = self.client.get(self.url)
+        self.assertFalse(response.has_header('X-Page-Cache'))
+
+    def test_stale_copy_served_during_rebuild(self):
+        """Пока страницу пересобирает другой запрос, отдаётся старая"""
+        self.client.get(self.url)
+        Post.objects.create(author=self.author, text='Свежий пост')
+        self.assertTrue(page_cache.acquire(self.key))
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], 'stale')
+        self.assertNotContains(response, 'Свежий пост')
+
+    @override_settings(PAGE_CACHE_WAIT=0.05)
+    def test_cold_miss_waits_for_builder(self):
+        """Без копии запрос ждёт сборщика, а не дождавшись — рендерит сам"""
+        self.assertTrue(page_cache.acquire(self.key))
+        started = time.monotonic()
+        response = self.client.get(self.url)
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+        self.assertContains(response, 'Первый пост')
+        self.assertIsNone(page_cache.get(self.key))
@@ -0,0 +1,58 @@
+import hashlib
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from ..models import StoredFile
+from ..storage import ContentAddressedStorage
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.storage = ContentAddressedStorage()
+
+    def test_sharded_name(self):
+        """Файл лежит по пути из хэша содержимого"""
+        digest = hashlib.sha256(b'data').hexdigest()
+        name = self.storage.save('posts/Photo.JPG', ContentFile(b'data'))
+        self.assertEqual(
+            name, f'posts/{digest[:2]}/{digest[2:4]}/{digest}.jpg')
+        with self.storage.open(name) as stored:
+            self.assertEqual(stored.read(), b'data')
+
+    def test_duplicates_share_file(self):
+        """Одинаковые загрузки — один файл и две ссылки"""
+        first = self.storage.save('posts/a.gif', ContentFile(b'same'))
+        second = self.storage.save('posts/b.gif', ContentFile(b'same'))
+        self.assertEqual(first, second)
+        self.assertEqual(StoredFile.objects.get(name=first).refs, 2)
+
+    def test_last_release_deletes_file(self):
+        """Файл удаляется вместе с последней ссылкой"""
+        name = self.storage.save('posts/a.gif', ContentFile(b'released'))
+        self.storage.save('posts/b.gif', ContentFile(b'released'))
+        with mock.patch('core.storage.transaction.on_commit',
+                        lambda callback: callback()):
+            self.storage.release(name)
+            self.assertTrue(self.storage.exists(name))
+            self.storage.release(name)
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+    def test_untracked_file_not_deleted(self):
+        """Файлы без учёта ссылок release не трогает"""
+        name = self.storage._save('posts/legacy.gif', ContentFile(b'old'))
+        self.storage.release(name)
+        self.assertTrue(self.storage.exists(name))
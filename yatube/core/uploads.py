@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+
+class CappedUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку сразу во временный файл, минуя память, и не больше
+    ``UPLOAD_MAX_BYTES``.
+
+    Всё, что сверх лимита, отбрасывается, а у файла выставляется
+    ``oversized``: отклонить его с понятной ошибкой — дело формы.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.oversized = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.UPLOAD_MAX_BYTES:
+            self.oversized = True
+            return None
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        upload = super().file_complete(min(file_size,
+                                           settings.UPLOAD_MAX_BYTES))
+        upload.oversized = self.oversized
+        return upload
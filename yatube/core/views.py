@@ -1,5 +1,9 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse
 from django.shortcuts import render
 
+from . import jobs, metrics
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +19,12 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
+
+
+@staff_member_required
+def metrics_view(request):
+    return HttpResponse(
+        metrics.render_prometheus(metrics.collect())
+        + metrics.render_gauges(jobs.queue_stats()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from .models import Comment, Follow, Group, Post
+from .search import fts_available, match_expression, matching_ids
 
 
 @admin.register(Post)
@@ -11,6 +12,12 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not fts_available() or not match_expression(search_term):
+            return super().get_search_results(request, queryset,
+                                              search_term)
+        return queryset.filter(pk__in=matching_ids(search_term)), False
+
 
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
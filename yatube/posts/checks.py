@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+from django.db import DatabaseError, connection
+from django.utils import timezone
+
+FEED_ORDERING = ('-pub_date', '-id')
+
+
+def feed_querysets():
+    """Запросы страниц ленты в том виде, в каком их выполняют вьюхи."""
+    from .models import Comment, Post, User
+    from .timeline import TimelinePaginator
+
+    limit = settings.POST_LIM + 1
+    posts = Post.objects.order_by(*FEED_ORDERING)
+    timeline = TimelinePaginator(User(pk=1), settings.POST_LIM)
+    entries, pulled = timeline.slices(None, True, limit)
+    cursor = [timezone.now(), 1]
+    entries_after, pulled_after = timeline.slices(cursor, True, limit)
+    entries_before, pulled_before = timeline.slices(cursor, False, limit)
+    return {
+        'posts:index': posts.select_related('author', 'group')[:limit],
+        'posts:group_list': posts.filter(
+            group_id=1).select_related('author')[:limit],
+        'posts:profile': posts.filter(
+            author_id=1).select_related('group')[:limit],
+        'posts:follow_index': entries,
+        'posts:follow_index:pulled': pulled,
+        'posts:follow_index:after': entries_after,
+        'posts:follow_index:pulled_after': pulled_after,
+        'posts:follow_index:before': entries_before,
+        'posts:follow_index:pulled_before': pulled_before,
+        'posts:post_detail': Comment.objects.filter(
+            post_id=1).select_related('author').order_by(
+            '-created', '-id')[:limit],
+    }
+
+
+def plan_problems(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        details = [row[-1] for row in cursor.fetchall()]
+    return [detail for detail in details
+            if 'TEMP B-TREE' in detail
+            or (detail.startswith('SCAN') and 'USING' not in detail
+                and 'VIRTUAL TABLE' not in detail)]
+
+
+@register(Tags.database)
+def check_feed_query_plans(app_configs, **kwargs):
+    """Предупредить о полном сканировании и сортировке во временном
+    B-дереве в запросах ленты. Запускается через
+    ``manage.py check --tag database``.
+    """
+    if connection.vendor != 'sqlite':
+        return []
+    warnings = []
+    for view_name, queryset in feed_querysets().items():
+        try:
+            problems = plan_problems(queryset)
+        except DatabaseError:
+            # Таблиц ещё нет, например перед первым migrate.
+            return []
+        for problem in problems:
+            warnings.append(Warning(
+                f'Запрос {view_name} не использует индекс: {problem}',
+                hint='Добавьте составной индекс под фильтр и сортировку.',
+                obj=view_name,
+                id='posts.W001',
+            ))
+    return warnings
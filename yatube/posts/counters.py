@@ -0,0 +1,68 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserCounter
+
+USER_COUNTERS = {
+    'posts': (Post, 'author'),
+    'followers': (Follow, 'author'),
+    'following': (Follow, 'user'),
+}
+
+
+def _count_subquery(model, field, outer='pk'):
+    counts = model.objects.filter(**{field: OuterRef(outer)}).order_by(
+    ).values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def actual_user_counters():
+    """Пользователи с настоящими значениями счётчиков в ``actual_*``."""
+    return User.objects.annotate(**{
+        f'actual_{name}': _count_subquery(model, field)
+        for name, (model, field) in USER_COUNTERS.items()
+    })
+
+
+def actual_comment_counts():
+    return Post.objects.annotate(
+        actual_comments=_count_subquery(Comment, 'post'))
+
+
+def recount_comments(posts):
+    """Пересчитать ``comments_count`` постов одним UPDATE."""
+    return posts.update(comments_count=_count_subquery(Comment, 'post'))
+
+
+def recount_user(user_id):
+    user = actual_user_counters().get(pk=user_id)
+    counters, _ = UserCounter.objects.update_or_create(
+        user_id=user_id,
+        defaults={name: getattr(user, f'actual_{name}')
+                  for name in USER_COUNTERS},
+    )
+    return counters
+
+
+def user_counters(user):
+    try:
+        return user.counters
+    except UserCounter.DoesNotExist:
+        return recount_user(user.pk)
+
+
+def bump_user(user_id, name, delta):
+    """Сдвинуть счётчик пользователя.
+
+    Если строки ещё нет, она создаётся пересчётом, но только при росте
+    счётчика: удаления идут и при каскадном удалении самого пользователя.
+    """
+    updated = UserCounter.objects.filter(user_id=user_id).update(
+        **{name: F(name) + delta})
+    if not updated and delta > 0:
+        recount_user(user_id)
+
+
+def bump_comments(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta)
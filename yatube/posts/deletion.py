@@ -0,0 +1,112 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.jobs import heartbeat, task
+from . import counters, reactions
+from .feed_cache import bump_feed_generation, bump_page_generation
+from .models import (Comment, Follow, Post, Reaction, ReactionCounter,
+                     TimelineEntry, User, UserCounter)
+
+
+def _chunks(queryset):
+    """id строк ``queryset`` кусками по ``PURGE_CHUNK_SIZE``, пока они
+    не кончатся. Каждый кусок нужно удалить до следующей итерации.
+    Перед куском продлевается блокировка фоновой задачи.
+    """
+    while True:
+        heartbeat()
+        ids = list(queryset.order_by().values_list(
+            'pk', flat=True)[:settings.PURGE_CHUNK_SIZE])
+        if not ids:
+            return
+        yield ids
+
+
+def delete_raw(queryset):
+    """Удалить строки кусками одним DELETE на кусок: без загрузки
+    объектов, каскада и сигналов.
+    """
+    model = queryset.model
+    for ids in _chunks(queryset):
+        model._base_manager.filter(pk__in=ids)._raw_delete(queryset.db)
+
+
+def delete_with_signals(queryset):
+    """Удалить строки кусками через ORM: сигналы обновят счётчики,
+    ленты и кеши, а в памяти одновременно не больше куска объектов.
+    """
+    for ids in _chunks(queryset):
+        delete_existing(queryset.model, ids)
+
+
+def delete_existing(model, ids):
+    """Удалить через ORM те строки из ``ids``, что ещё есть.
+
+    Первым в транзакции идёт пустой UPDATE: он берёт блокировку записи,
+    так что повторный запуск той же задачи ждёт коммита и уже не находит
+    строк. ``post_delete`` и счётчики в его обработчиках срабатывают по
+    разу на строку.
+    """
+    pk_name = model._meta.pk.name
+    with transaction.atomic():
+        rows = model._base_manager.filter(pk__in=ids)
+        if rows.update(**{pk_name: F(pk_name)}):
+            rows.delete()
+
+
+def delete_post(post):
+    """Скрыть пост сразу, а удалить из базы в фоне."""
+    post.deleted_at = timezone.now()
+    post.save(update_fields=['deleted_at'])
+    counters.bump_user(post.author_id, 'posts', -1)
+    purge_post.delay(post.pk)
+
+
+def delete_user(user):
+    """Отключить пользователя и скрыть его посты сразу, а удалить всё
+    в фоне.
+    """
+    user.is_active = False
+    user.save(update_fields=['is_active'])
+    Post.objects.filter(author=user).update(deleted_at=timezone.now())
+    bump_feed_generation()
+    bump_page_generation()
+    purge_user.delay(user.pk)
+
+
+@task
+def purge_post(post_id):
+    """Удалить скрытый пост: комментарии и записи лент — кусками без
+    сигналов, сам пост — через ORM, чтобы освободить картинку.
+    """
+    if not Post.all_objects.filter(
+            pk=post_id, deleted_at__isnull=False).exists():
+        return
+    delete_raw(Comment.objects.filter(post_id=post_id))
+    delete_raw(TimelineEntry.objects.filter(post_id=post_id))
+    delete_raw(Reaction.objects.filter(post_id=post_id))
+    delete_raw(ReactionCounter.objects.filter(post_id=post_id))
+    delete_existing(Post, [post_id])
+
+
+@task
+def purge_user(user_id):
+    """Удалить отключённого пользователя со всеми данными кусками."""
+    if not User.objects.filter(pk=user_id, is_active=False).exists():
+        return
+    Post.objects.filter(author_id=user_id).update(deleted_at=timezone.now())
+    delete_with_signals(Follow.objects.filter(
+        Q(user_id=user_id) | Q(author_id=user_id)))
+    # Комментарии под своими постами уйдут вместе с постами.
+    delete_with_signals(Comment.objects.filter(author_id=user_id).exclude(
+        post__author_id=user_id))
+    for ids in _chunks(Post.all_objects.filter(
+            author_id=user_id, deleted_at__isnull=False)):
+        for post_id in ids:
+            purge_post(post_id)
+    delete_raw(TimelineEntry.objects.filter(user_id=user_id))
+    reactions.forget_user(user_id, settings.PURGE_CHUNK_SIZE)
+    UserCounter.objects.filter(user_id=user_id).delete()
+    User.objects.filter(pk=user_id).delete()
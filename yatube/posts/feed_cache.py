@@ -0,0 +1,65 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+FEED_GENERATION_KEY = 'posts:feed_generation'
+PAGE_GENERATION_KEY = 'posts:page_generation'
+
+
+def _initial_generation():
+    # После вытеснения ключа поколение не должно совпасть со старым,
+    # иначе всплывут фрагменты, закешированные до вытеснения.
+    return int(time.time() * 1000)
+
+
+def _generation(key):
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, _initial_generation(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_generation(), None)
+
+
+def feed_generation():
+    return _generation(FEED_GENERATION_KEY)
+
+
+def bump_feed_generation():
+    _bump(FEED_GENERATION_KEY)
+
+
+def page_generation():
+    """Версия публичных страниц для кеша целых ответов: меняется при
+    любой правке постов, комментариев, подписок, групп и профилей.
+    """
+    return _generation(PAGE_GENERATION_KEY)
+
+
+def bump_page_generation():
+    _bump(PAGE_GENERATION_KEY)
+
+
+def reactions_generation(user_id):
+    """Версия отметок пользователя для ETag его страниц."""
+    return _generation(f'posts:reactions_generation:{user_id}')
+
+
+def bump_reactions_generation(user_id):
+    _bump(f'posts:reactions_generation:{user_id}')
+
+
+def counts_window():
+    """Номер текущего окна счётчиков на странице.
+
+    Просмотры и чужие отметки не меняют поколений, поэтому ETag и
+    фрагменты со счётчиками живут не дольше ``COUNTS_REFRESH_INTERVAL``.
+    """
+    return int(time.time() // settings.COUNTS_REFRESH_INTERVAL)
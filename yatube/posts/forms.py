@@ -1,6 +1,8 @@
 from django.forms import ModelForm
 
+from .images import NO_IMAGE, oversized_error, prepare_upload, validate_upload
 from .models import Comment, Post
+from .thumbnails import generate_thumbnails
 
 
 class PostForm(ModelForm):
@@ -9,6 +11,49 @@ class PostForm(ModelForm):
         labels = {'group': 'Группа', 'text': 'Сообщение'}
         fields = ("group", "text", "image")
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if 'image' not in self.changed_data:
+            return image
+        meta = NO_IMAGE
+        if image:
+            validate_upload(image)
+            image, meta = prepare_upload(image)
+        for name, value in meta.items():
+            setattr(self.instance, name, value)
+        return image
+
+    def clean(self):
+        # Обрезанный по лимиту файл ImageField считает битым; настоящая
+        # причина — размер.
+        upload = self.files.get(self.add_prefix('image'))
+        if getattr(upload, 'oversized', False):
+            self._errors.pop('image', None)
+            self.add_error('image', oversized_error())
+        return super().clean()
+
+    def update_fields(self):
+        """Поля, которые пишет правка: счётчики и отметку удаления за это
+        время могли сдвинуть другие запросы, их перезаписывать нельзя.
+        """
+        fields = list(self._meta.fields)
+        if 'image' in self.changed_data:
+            fields += NO_IMAGE
+        return fields
+
+    def save(self, commit=True):
+        post = super().save(commit=False)
+        if not commit:
+            return post
+        if post._state.adding:
+            post.save()
+        else:
+            post.save(update_fields=self.update_fields())
+        self._save_m2m()
+        if post.image and 'image' in self.changed_data:
+            generate_thumbnails.delay(post.image.name, post.image_width)
+        return post
+
 
 class CommentForm(ModelForm):
     class Meta:
@@ -0,0 +1,182 @@
+import base64
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from PIL import Image, ImageFilter
+
+from core import metrics
+
+# Пустые значения полей картинки для поста без неё.
+NO_IMAGE = {
+    'image_width': None,
+    'image_height': None,
+    'image_mime': '',
+    'image_bytes': None,
+    'image_placeholder': '',
+}
+
+# Ключи Image.info с метаданными, которые не должны уйти в публичный файл.
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'photoshop', 'comment',
+                 'Raw profile type exif')
+
+# В каком формате и с какими опциями пересохранять картинку с метаданными.
+REENCODE = {
+    'JPEG': ('JPEG', {'quality': 90}),
+    'MPO': ('JPEG', {'quality': 90}),
+    'PNG': ('PNG', {}),
+    'WEBP': ('WEBP', {'quality': 90}),
+}
+
+# Форматы, которые Image.draft() декодирует сразу в уменьшенном масштабе.
+# Остальные декодируются целиком, поэтому для них свой лимит пикселей.
+DRAFT_FORMATS = ('JPEG', 'MPO')
+
+ORIENTATION = 0x0112
+TRANSPOSE = {
+    2: Image.FLIP_LEFT_RIGHT,
+    3: Image.ROTATE_180,
+    4: Image.FLIP_TOP_BOTTOM,
+    5: Image.TRANSPOSE,
+    6: Image.ROTATE_270,
+    7: Image.TRANSVERSE,
+    8: Image.ROTATE_90,
+}
+
+
+def _has_metadata(image):
+    """Пересохраняется ли картинка без метаданных: тогда она
+    декодируется целиком, даже если формат умеет ``draft()``."""
+    return image.format in REENCODE and any(
+        key in image.info for key in METADATA_KEYS)
+
+
+def oversized_error():
+    return ValidationError(
+        'Файл больше %(limit)s МБ.', code='too_large',
+        params={'limit': settings.UPLOAD_MAX_BYTES // 2 ** 20})
+
+
+def validate_upload(upload):
+    """Проверить лимиты ``UPLOAD_MAX_BYTES`` и ``UPLOAD_MAX_PIXELS``.
+
+    Размеры и формат берутся из заголовка, который уже прочитал
+    ImageField, так что бомба с огромным числом пикселей отсекается до
+    декодирования. Картинки не из ``DRAFT_FORMATS`` и картинки с
+    метаданными, которые пересохраняются, декодируются целиком и
+    ограничены ``UPLOAD_MAX_DECODED_PIXELS``.
+    """
+    if getattr(upload, 'oversized', False) or (
+            upload.size > settings.UPLOAD_MAX_BYTES):
+        raise oversized_error()
+    width, height = upload.image.size
+    decoded_in_full = (upload.image.format not in DRAFT_FORMATS
+                       or _has_metadata(upload.image))
+    limit = (settings.UPLOAD_MAX_DECODED_PIXELS if decoded_in_full
+             else settings.UPLOAD_MAX_PIXELS)
+    if width * height > limit:
+        raise ValidationError(
+            'Картинка больше %(limit)s мегапикселей.',
+            code='too_many_pixels',
+            params={'limit': limit // 10 ** 6})
+
+
+def _placeholder(image):
+    """Размытая заглушка: JPEG в пару сотен байт в виде data URI."""
+    size = settings.IMAGE_PLACEHOLDER_SIZE
+    preview = image.convert('RGB')
+    preview.thumbnail((size, size))
+    preview = preview.filter(ImageFilter.GaussianBlur(1))
+    buffer = BytesIO()
+    preview.save(buffer, 'JPEG', quality=40)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/jpeg;base64,{encoded}'
+
+
+def _pixel_bytes(image):
+    return image.width * image.height * len(image.getbands())
+
+
+def describe_image(file):
+    """Размеры, MIME-тип, вес и размытая заглушка картинки.
+
+    Шаблон ставит заглушку фоном, пока грузится сама картинка. JPEG
+    декодируется сразу в уменьшенном масштабе, так что целиком в память
+    он не попадает.
+    """
+    file.seek(0)
+    with Image.open(file) as image:
+        width, height = image.size
+        mime = Image.MIME.get(image.format, '')
+        image.draft('RGB', (settings.IMAGE_PLACEHOLDER_SIZE,) * 2)
+        placeholder = _placeholder(image)
+    return {
+        'image_width': width,
+        'image_height': height,
+        'image_mime': mime,
+        'image_bytes': file.size,
+        'image_placeholder': placeholder,
+    }
+
+
+def _reencode(image, upload, icc_profile, format_, options):
+    """Пересохранить картинку во временный файл без метаданных.
+
+    Цветовой профиль сохраняется: без него поплывут цвета.
+    """
+    name = os.path.basename(upload.name)
+    if format_ == 'JPEG':
+        name = os.path.splitext(name)[0] + '.jpg'
+    cleaned = TemporaryUploadedFile(
+        name, Image.MIME.get(format_, upload.content_type), 0, None)
+    if icc_profile:
+        options = dict(options, icc_profile=icc_profile)
+    # PNG без явного exif взял бы его из image.info.
+    image.save(cleaned, format_, exif=b'', **options)
+    cleaned.size = cleaned.tell()
+    cleaned.seek(0)
+    return cleaned
+
+
+def prepare_upload(upload):
+    """Подготовить загруженную картинку за одно декодирование.
+
+    Если в файле есть EXIF или другие метаданные, картинка поворачивается
+    по EXIF-ориентации и пересохраняется без них. Заглушка строится из
+    того же декодированного изображения. Возвращает файл для сохранения
+    и значения полей ``image_*``; память под пиксели попадает в метрику
+    ``upload_image_bytes``.
+    """
+    upload.seek(0)
+    with Image.open(upload) as image:
+        if _has_metadata(image):
+            reencode = REENCODE[image.format]
+            image.load()
+            memory = _pixel_bytes(image)
+            method = TRANSPOSE.get(image.getexif().get(ORIENTATION))
+            cleaned_image = image.transpose(method) if method else image
+            if method:
+                memory += _pixel_bytes(cleaned_image)
+            upload = _reencode(cleaned_image, upload,
+                               image.info.get('icc_profile'), *reencode)
+            size = cleaned_image.size
+            mime = Image.MIME.get(reencode[0], '')
+            placeholder = _placeholder(cleaned_image)
+        else:
+            size = image.size
+            mime = Image.MIME.get(image.format, '')
+            image.draft('RGB', (settings.IMAGE_PLACEHOLDER_SIZE,) * 2)
+            image.load()
+            memory = _pixel_bytes(image)
+            placeholder = _placeholder(image)
+    metrics.observe('upload_image_bytes', memory)
+    upload.seek(0)
+    return upload, {
+        'image_width': size[0],
+        'image_height': size[1],
+        'image_mime': mime,
+        'image_bytes': upload.size,
+        'image_placeholder': placeholder,
+    }
@@ -0,0 +1,42 @@
+from django.http import Http404
+
+from core.invalidation import LocalCache
+from .counters import user_counters
+from .models import Group, User
+
+# Группы и авторы читаются на каждой странице ленты, а меняются редко.
+# Записи вытесняются по шине инвалидации из signals.py.
+_groups = LocalCache()
+_authors = LocalCache()
+
+
+def group_tags(group_id, slug):
+    return (f'group:{group_id}', f'group-slug:{slug}')
+
+
+def user_tags(user_id, username):
+    return (f'user:{user_id}', f'username:{username}')
+
+
+def get_group(slug):
+    group = _groups.get(slug)
+    if group is None:
+        group = Group.objects.filter(slug=slug).first()
+        if group is None:
+            raise Http404('Группа не найдена')
+        _groups.set(slug, group, group_tags(group.pk, group.slug))
+    return group
+
+
+def get_author(username):
+    """Автор вместе со счётчиками для страницы профиля."""
+    author = _authors.get(username)
+    if author is None:
+        author = User.objects.select_related('counters').filter(
+            username=username).first()
+        if author is None:
+            raise Http404('Пользователь не найден')
+        # Без строки счётчиков каждое обращение к кешу пересчитывало бы их.
+        author.counters = user_counters(author)
+        _authors.set(username, author, user_tags(author.pk, author.username))
+    return author
@@ -0,0 +1,84 @@
+import json
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.models import Group, Post, User
+
+
+def model_page(queryset, size):
+    return list(queryset.select_related('author', 'group')[:size])
+
+
+def rows_page(queryset, size):
+    return list(queryset.rows()[:size])
+
+
+BUILDERS = {'models': model_page, 'rows': rows_page}
+
+
+def measure(build, queryset, size, pages):
+    """Память и процессорное время одной страницы ленты.
+
+    Память меряется tracemalloc отдельным проходом: трассировка
+    замедляет выполнение и исказила бы время.
+    """
+    build(queryset, size)
+    started = time.process_time()
+    for _ in range(pages):
+        build(queryset, size)
+    cpu = (time.process_time() - started) / pages
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        page = build(queryset, size)
+        retained = tracemalloc.get_traced_memory()[0] - before
+        blocks = sum(stat.count for stat in
+                     tracemalloc.take_snapshot().statistics('filename'))
+    finally:
+        tracemalloc.stop()
+    del page
+    return {
+        'cpu_ms': round(cpu * 1000, 3),
+        'retained_kb': round(retained / 1024, 1),
+        'live_blocks': blocks,
+    }
+
+
+class Command(BaseCommand):
+    help = ('Сравнение страниц ленты из моделей и из строк PostRow: '
+            'процессорное время и память на страницу, результат — JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=200,
+                            help='Повторов на каждую ленту')
+        parser.add_argument('--size', type=int, default=settings.POST_LIM,
+                            help='Постов на странице')
+
+    def handle(self, *args, **options):
+        group = Group.objects.filter(posts__isnull=False).first()
+        author = User.objects.filter(posts__isnull=False).first()
+        if group is None or author is None:
+            raise CommandError('Нет данных: сначала запустите seed_bench')
+        feeds = {
+            'index': Post.objects.all(),
+            'group_list': group.posts.all(),
+            'profile': author.posts.all(),
+        }
+        results = {}
+        for name, queryset in feeds.items():
+            queryset = queryset.order_by('-pub_date', '-id')
+            result = {
+                kind: measure(build, queryset, options['size'],
+                              options['pages'])
+                for kind, build in BUILDERS.items()
+            }
+            models, rows = result['models'], result['rows']
+            result['cpu_ratio'] = round(
+                rows['cpu_ms'] / models['cpu_ms'], 2)
+            result['memory_ratio'] = round(
+                rows['retained_kb'] / models['retained_kb'], 2)
+            results[name] = result
+        self.stdout.write(json.dumps(results, ensure_ascii=False, indent=2))
@@ -0,0 +1,57 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate_thumbnails
+
+
+def build(item):
+    image_name, image_width = item
+    try:
+        generate_thumbnails(image_name, image_width)
+    except (OSError, ValueError) as error:
+        return f'{image_name}: {error}'
+    return None
+
+
+class Command(BaseCommand):
+    help = ('Строит миниатюры и варианты для srcset картинкам всех постов '
+            'в несколько процессов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int,
+                            default=os.cpu_count() or 1,
+                            help='Сколько процессов строят варианты')
+        parser.add_argument('--chunk-size', type=int, default=16,
+                            help='Сколько картинок процесс берёт за раз')
+
+    def handle(self, *args, **options):
+        # Одинаковые файлы у разных постов строятся один раз.
+        items = Post.objects.exclude(image='').order_by().values_list(
+            'image', 'image_width').distinct().iterator()
+        if options['processes'] == 1:
+            results = map(build, items)
+            self.report(results)
+            return
+        with ProcessPoolExecutor(
+            max_workers=options['processes'],
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        ) as pool:
+            self.report(pool.map(build, items,
+                                 chunksize=options['chunk_size']))
+
+    def report(self, results):
+        built = failed = 0
+        for error in results:
+            if error is None:
+                built += 1
+            else:
+                failed += 1
+                self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {built}, с ошибками: {failed}'))
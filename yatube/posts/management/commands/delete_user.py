@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.deletion import delete_user
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = ('Отключает пользователя и скрывает его посты; данные удаляет '
+            'фоновая задача purge_user')
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(f'Нет пользователя {options["username"]}')
+        delete_user(user)
+        self.stdout.write(self.style.SUCCESS(
+            f'{user.username} отключён, удаление поставлено в очередь'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from posts.images import describe_image
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Заполняет размеры, тип, вес и заглушку картинок постов, '
+            'загруженных до появления этих полей')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Сколько постов читать из БД за раз')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').filter(
+            image_width__isnull=True).only('pk', 'image')
+        filled = failed = 0
+        for post in posts.iterator(chunk_size=options['batch_size']):
+            try:
+                with post.image.open('rb') as image:
+                    meta = describe_image(image)
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f'{post.image.name}: {error}')
+                continue
+            Post.objects.filter(pk=post.pk).update(**meta)
+            filled += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Заполнено: {filled}, с ошибками: {failed}'))
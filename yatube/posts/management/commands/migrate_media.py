@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Переносит картинки постов из плоского каталога posts/ '
+            'в хранилище с адресацией по содержимому')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Сколько постов читать из БД за раз')
+        parser.add_argument('--keep-originals', action='store_true',
+                            help='Не удалять старые файлы после переноса')
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        legacy = Post.objects.exclude(image='').exclude(
+            image__regex=r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}'
+        ).order_by('pk').values_list('image', flat=True)
+        done = set()
+        moved = missing = 0
+        for old_name in legacy.iterator(chunk_size=options['batch_size']):
+            if old_name in done:
+                continue
+            done.add(old_name)
+            if not storage.exists(old_name):
+                missing += 1
+                continue
+            # Файл читается и хэшируется кусками, целиком в память
+            # он не попадает.
+            with storage.open(old_name, 'rb') as source:
+                new_name = storage.save(old_name, source)
+            posts = Post.objects.filter(image=old_name).update(image=new_name)
+            # save() уже учёл одну ссылку, остальные — от других постов
+            # с тем же файлом.
+            for _ in range(posts - 1):
+                storage.retain(new_name)
+            if not options['keep_originals']:
+                storage.delete(old_name)
+            moved += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено файлов: {moved}, не найдено: {missing}'))
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import timeline
+from posts.models import Follow, Post, TimelineEntry
+
+
+class Command(BaseCommand):
+    help = 'Заново раскладывает посты по лентам подписчиков'
+
+    def handle(self, *args, **options):
+        # Без order_by() сортировка Meta.ordering попала бы в DISTINCT,
+        # и автор повторился бы на каждый свой пост.
+        authors = Post.objects.order_by().values_list(
+            'author_id', flat=True).distinct()
+        pushed = 0
+        for author_id in authors.iterator():
+            fan_out = timeline.should_fan_out(author_id)
+            with transaction.atomic():
+                TimelineEntry.objects.filter(
+                    post__author_id=author_id).delete()
+                Post.objects.filter(author_id=author_id).update(
+                    pushed_to_timelines=fan_out)
+                if not fan_out:
+                    continue
+                for follow in Follow.objects.filter(author_id=author_id):
+                    timeline.backfill(follow)
+                pushed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты пересобраны, авторов с раскладкой: {pushed}, '
+            f'порог подписчиков: {settings.TIMELINE_FANOUT_LIMIT}'))
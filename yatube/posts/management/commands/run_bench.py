@@ -0,0 +1,165 @@
+import json
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post, User
+
+VIEWS = ('posts:index', 'posts:group_list', 'posts:profile',
+         'posts:post_detail', 'posts:follow_index')
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный прогон основных страниц ленты параллельными '
+            'клиентами; результат — JSON с перцентилями задержки и '
+            'числом запросов к БД.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Запросов на каждую страницу')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--views', nargs='+', default=VIEWS,
+                            choices=VIEWS)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Сохранить результат в файл')
+        parser.add_argument('--baseline',
+                            help='Сравнить с сохранённым результатом')
+        parser.add_argument(
+            '--tolerance', type=float, default=10.0,
+            help='Допустимый рост p95 относительно базы, %%')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.load_targets()
+        # Прогон начинается с холодного кеша страниц: копии от прошлой
+        # базы исказили бы и задержки, и число запросов.
+        caches['pages'].clear()
+        results = {
+            'meta': {
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'posts': Post.objects.count(),
+                'vendor': connection.vendor,
+            },
+            'views': {},
+        }
+        for view_name in options['views']:
+            urls = [self.url_for(view_name)
+                    for _ in range(options['requests'])]
+            results['views'][view_name] = self.run_view(
+                view_name, urls, options['concurrency'])
+        report = json.dumps(results, ensure_ascii=False, indent=2)
+        self.stdout.write(report)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(report)
+        if options['baseline']:
+            self.compare(results, options['baseline'], options['tolerance'])
+
+    def load_targets(self):
+        sample = settings.BENCH_SAMPLE_SIZE
+        self.group_slugs = list(
+            Group.objects.values_list('slug', flat=True)[:sample])
+        self.usernames = list(User.objects.filter(
+            posts__isnull=False).values_list(
+            'username', flat=True).distinct()[:sample])
+        self.post_ids = list(
+            Post.objects.values_list('pk', flat=True)[:sample])
+        self.reader = User.objects.filter(
+            pk__in=Follow.objects.values('user')).first()
+        if not (self.group_slugs and self.usernames and self.reader):
+            raise CommandError('Нет данных: сначала запустите seed_bench')
+
+    def url_for(self, view_name):
+        if view_name == 'posts:group_list':
+            return reverse(view_name,
+                           args=[self.random.choice(self.group_slugs)])
+        if view_name == 'posts:profile':
+            return reverse(view_name,
+                           args=[self.random.choice(self.usernames)])
+        if view_name == 'posts:post_detail':
+            return reverse(view_name,
+                           args=[self.random.choice(self.post_ids)])
+        return reverse(view_name)
+
+    def fetch(self, view_name, url):
+        client = Client()
+        if view_name == 'posts:follow_index':
+            client.force_login(self.reader)
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            response = client.get(url)
+            elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            raise CommandError(f'{url} ответил {response.status_code}')
+        return elapsed, counter.count
+
+    def fetch_in_thread(self, view_name, url):
+        try:
+            return self.fetch(view_name, url)
+        finally:
+            connections.close_all()
+
+    def run_view(self, view_name, urls, concurrency):
+        started = time.perf_counter()
+        if concurrency == 1:
+            samples = [self.fetch(view_name, url) for url in urls]
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                samples = list(pool.map(
+                    lambda url: self.fetch_in_thread(view_name, url), urls))
+        total = time.perf_counter() - started
+        latencies = [elapsed * 1000 for elapsed, _ in samples]
+        queries = [count for _, count in samples]
+        return {
+            'p50_ms': round(percentile(latencies, 0.50), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'rps': round(len(samples) / total, 1),
+            'queries_mean': round(statistics.mean(queries), 2),
+            'queries_max': max(queries),
+        }
+
+    def compare(self, results, baseline_path, tolerance):
+        with open(baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)['views']
+        regressions = []
+        for view_name, current in results['views'].items():
+            before = baseline.get(view_name)
+            if before is None:
+                continue
+            growth = (current['p95_ms'] / before['p95_ms'] - 1) * 100
+            self.stdout.write(
+                f'{view_name}: p95 {before["p95_ms"]} -> '
+                f'{current["p95_ms"]} мс ({growth:+.1f}%), запросов '
+                f'{before["queries_mean"]} -> {current["queries_mean"]}')
+            if (growth > tolerance
+                    or current['queries_mean'] > before['queries_mean']):
+                regressions.append(view_name)
+        if regressions:
+            raise CommandError(f'Регрессия: {", ".join(regressions)}')
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
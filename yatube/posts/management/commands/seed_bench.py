@@ -0,0 +1,206 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+from faker import Faker
+
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+
+TEXT_POOL_SIZE = 2000
+
+
+@contextmanager
+def manual_dates(*fields):
+    """Разрешить задавать даты полям с ``auto_now_add`` в bulk_create."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими данными для нагрузочных тестов. '
+            'Запускать на отдельной базе: id новых строк считаются '
+            'последовательными.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок на пользователя')
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='Показатель Ципфа для популярности авторов')
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.span = timedelta(days=options['days']).total_seconds()
+        faker = Faker('ru_RU')
+        faker.seed_instance(options['seed'])
+        self.texts = [faker.paragraph(nb_sentences=3)
+                      for _ in range(TEXT_POOL_SIZE)]
+        if connection.vendor == 'sqlite' and not connection.in_atomic_block:
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode = WAL')
+                cursor.execute('PRAGMA synchronous = OFF')
+
+        users = self.seed_users(options['users'], faker)
+        groups = self.seed_groups(options['groups'], faker)
+        # Популярность авторов распределена по Ципфу: немногие авторы
+        # получают большую часть подписок, постов и комментариев.
+        weights = list(accumulate(
+            1 / rank ** options['skew'] for rank in range(1, len(users) + 1)))
+        authors = users[:]
+        self.random.shuffle(authors)
+        self.pick_author = lambda: self.random.choices(
+            authors, cum_weights=weights)[0]
+        posts = self.seed_posts(options['posts'], groups)
+        self.seed_comments(options['comments'], users, posts)
+        self.seed_follows(options['follows'], users)
+        self.seed_timelines(posts)
+
+        call_command('sync_counters', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS('Данные для бенчмарка готовы'))
+
+    def batches(self, total, build):
+        for start in range(0, total, self.batch_size):
+            size = min(self.batch_size, total - start)
+            yield [build() for _ in range(size)]
+
+    def random_date(self):
+        return self.now - timedelta(seconds=self.random.random() * self.span)
+
+    def seed_users(self, total, faker):
+        first_id = next_id(User)
+        password = make_password(None)
+        prefix = f'bench{first_id}_'
+        for start in range(0, total, self.batch_size):
+            User.objects.bulk_create(
+                User(username=f'{prefix}{number}',
+                     first_name=faker.first_name(),
+                     last_name=faker.last_name(),
+                     password=password)
+                for number in range(start,
+                                    min(start + self.batch_size, total)))
+        self.stdout.write(f'Пользователей: {total}')
+        return list(range(first_id, first_id + total))
+
+    def seed_groups(self, total, faker):
+        first_id = next_id(Group)
+        Group.objects.bulk_create(
+            Group(title=faker.catch_phrase()[:200],
+                  slug=f'bench-{first_id + number}',
+                  description=self.random.choice(self.texts))
+            for number in range(total))
+        self.stdout.write(f'Групп: {total}')
+        return list(range(first_id, first_id + total))
+
+    def seed_posts(self, total, groups):
+        first_id = next_id(Post)
+
+        def build():
+            return Post(author_id=self.pick_author(),
+                        group_id=(self.random.choice(groups)
+                                  if groups and self.random.random() < 0.6
+                                  else None),
+                        text=self.random.choice(self.texts),
+                        pub_date=self.random_date())
+
+        with manual_dates(Post._meta.get_field('pub_date')):
+            for batch in self.batches(total, build):
+                with transaction.atomic():
+                    Post.objects.bulk_create(batch)
+        self.stdout.write(f'Постов: {total}')
+        return first_id, first_id + total - 1
+
+    def seed_comments(self, total, users, posts):
+        first_post, last_post = posts
+        if last_post < first_post:
+            return
+
+        def build():
+            return Comment(post_id=self.random.randint(first_post, last_post),
+                           author_id=self.random.choice(users),
+                           text=self.random.choice(self.texts),
+                           created=self.random_date())
+
+        with manual_dates(Comment._meta.get_field('created')):
+            for batch in self.batches(total, build):
+                with transaction.atomic():
+                    Comment.objects.bulk_create(batch)
+        self.stdout.write(f'Комментариев: {total}')
+
+    def seed_follows(self, per_user, users):
+        created = 0
+        for start in range(0, len(users), self.batch_size):
+            follows = set()
+            for user_id in users[start:start + self.batch_size]:
+                count = min(int(self.random.expovariate(1 / per_user)),
+                            len(users) - 1)
+                for _ in range(count):
+                    author_id = self.pick_author()
+                    if author_id != user_id:
+                        follows.add((user_id, author_id))
+            with transaction.atomic():
+                Follow.objects.bulk_create(
+                    (Follow(user_id=user_id, author_id=author_id)
+                     for user_id, author_id in follows),
+                    ignore_conflicts=True)
+            created += len(follows)
+        self.stdout.write(f'Подписок: {created}')
+
+    def seed_timelines(self, posts):
+        """Разложить посты по лентам, как это сделала бы публикация.
+
+        Посты авторов, у которых подписчиков не больше
+        ``TIMELINE_FANOUT_LIMIT``, помечаются разложенными и попадают в
+        ленты подписчиков одним INSERT ... SELECT. Остальные читаются из
+        подписок при показе ленты.
+        """
+        first_post, last_post = posts
+        if last_post < first_post:
+            return
+        heavy = Follow.objects.order_by().values('author_id').annotate(
+            followers=Count('pk'),
+        ).filter(
+            followers__gt=settings.TIMELINE_FANOUT_LIMIT,
+        ).values('author_id')
+        tables = {model.__name__: model._meta.db_table
+                  for model in (Follow, Post, TimelineEntry)}
+        with transaction.atomic():
+            Post.objects.filter(pk__range=posts).exclude(
+                author_id__in=heavy).update(pushed_to_timelines=True)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'INSERT INTO {TimelineEntry} (user_id, post_id, pub_date) '
+                    'SELECT follow.user_id, post.id, post.pub_date '
+                    'FROM {Post} post JOIN {Follow} follow '
+                    'ON follow.author_id = post.author_id '
+                    'WHERE post.pushed_to_timelines = %s '
+                    'AND post.id BETWEEN %s AND %s'.format(**tables),
+                    [True, first_post, last_post])
+                created = cursor.rowcount
+        self.stdout.write(f'Записей в лентах: {created}')
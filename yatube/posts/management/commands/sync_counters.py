@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from posts.counters import (USER_COUNTERS, actual_comment_counts,
+                            actual_user_counters, recount_comments)
+from posts.models import Post, UserCounter
+
+
+class Command(BaseCommand):
+    help = 'Сверяет денормализованные счётчики и исправляет расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только показать расхождения, ничего не исправлять',
+        )
+
+    def handle(self, *args, **options):
+        drift = self.sync_users(options['check'])
+        drift += self.sync_posts(options['check'])
+        if options['check'] and drift:
+            self.stdout.write(self.style.WARNING(
+                f'Найдено расхождений: {drift}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Счётчики сверены, расхождений: {drift}'))
+
+    def sync_users(self, check_only):
+        drifted = Q(counters__isnull=True)
+        for name in USER_COUNTERS:
+            drifted |= ~Q(**{f'counters__{name}': F(f'actual_{name}')})
+        drift = 0
+        for user in actual_user_counters().filter(drifted).iterator():
+            drift += 1
+            if not check_only:
+                UserCounter.objects.update_or_create(
+                    user_id=user.pk,
+                    defaults={name: getattr(user, f'actual_{name}')
+                              for name in USER_COUNTERS},
+                )
+        return drift
+
+    def sync_posts(self, check_only):
+        drifted = actual_comment_counts().exclude(
+            comments_count=F('actual_comments'))
+        if check_only:
+            return drifted.count()
+        return recount_comments(
+            Post.objects.filter(pk__in=drifted.values('pk')))
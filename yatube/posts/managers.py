@@ -0,0 +1,25 @@
+from django.db import models
+
+from .rows import POST_FIELDS, PostRowIterable
+
+
+class PostQuerySet(models.QuerySet):
+    def rows(self):
+        """Посты для страниц-списков в виде ``PostRow``.
+
+        Одна выборка ``values()`` с JOIN автора и группы: не создаются
+        ``Post``, ``User`` и ``Group`` с хэшем пароля, описанием группы
+        и прочими полями, которые лента не показывает.
+        """
+        queryset = self.values(*POST_FIELDS)
+        queryset._iterable_class = PostRowIterable
+        return queryset
+
+
+class PostManager(models.Manager.from_queryset(PostQuerySet)):
+    """Посты без удалённых: помеченные ``deleted_at`` пропадают со всех
+    страниц сразу, а из базы их удаляет фоновая задача.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
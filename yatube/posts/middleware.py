@@ -0,0 +1,19 @@
+from . import view_counts
+
+
+class PostViewsMiddleware:
+    """Считает просмотры страницы поста в буфер ``view_counts``.
+
+    Стоит перед кешем страниц, чтобы считались и отданные из кеша.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method == 'GET'
+                and request.resolver_match.view_name == 'posts:post_detail'):
+            view_counts.record_view(view_kwargs['post_id'])
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:03
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_auto_20261018_1744'),
+    ]
+
+    # Хранилище не меняет схему, а пересоздание таблицы в SQLite
+    # потеряло бы триггеры полнотекстового индекса из 0016.
+    operations = [
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name='post',
+                name='image',
+                field=models.ImageField(blank=True, storage=core.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+            ),
+        ]),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+from posts.search import preserving_fts_triggers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_auto_20261018_1805'),
+    ]
+
+    operations = preserving_fts_triggers(
+        migrations.AddField(
+            model_name='post',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Удалён'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(deleted_at__isnull=False), fields=['deleted_at'], name='post_deleted_at_idx'),
+        ),
+    )
@@ -0,0 +1,20 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:22
+
+from django.db import migrations, models
+
+from posts.search import preserving_fts_triggers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_post_deleted_at'),
+    ]
+
+    operations = preserving_fts_triggers(
+        migrations.AddField(
+            model_name='post',
+            name='views_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Просмотров'),
+        ),
+    )
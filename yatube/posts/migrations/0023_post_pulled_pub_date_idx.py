@@ -0,0 +1,17 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_reactions'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(pushed_to_timelines=False), fields=['-pub_date', '-id'], name='post_pulled_pub_date_idx'),
+        ),
+    ]
@@ -4,6 +4,8 @@ from django.contrib.auth import get_user_model
 from django.conf import settings
 from django.db import models
 
+from core.storage import ContentAddressedStorage
+from .managers import PostManager, PostQuerySet
 
 User = get_user_model()
 
@@ -39,14 +41,62 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    # Заполняются формой при загрузке, чтобы шаблонам и миниатюрам
+    # не открывать исходный файл ради размеров.
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки', null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(
+        'Высота картинки', null=True, blank=True, editable=False)
+    image_mime = models.CharField(
+        'Тип картинки', max_length=50, blank=True, editable=False)
+    image_bytes = models.PositiveIntegerField(
+        'Размер картинки в байтах', null=True, blank=True, editable=False)
+    image_placeholder = models.TextField(
+        'Заглушка картинки', blank=True, editable=False)
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
+    )
+    # Пополняется пачками из буфера posts.view_counts, а не на каждый
+    # просмотр.
+    views_count = models.PositiveIntegerField(
+        'Просмотров',
+        default=0,
+        editable=False
+    )
+    pushed_to_timelines = models.BooleanField(
+        'Разложен по лентам подписчиков',
+        default=False,
+        editable=False
+    )
+    deleted_at = models.DateTimeField(
+        'Удалён', null=True, blank=True, editable=False)
+
+    objects = PostManager()
+    all_objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.text[:settings.POST_STR]
 
     class Meta:
         ordering: Tuple[str] = ('-pub_date',)
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['deleted_at'], name='post_deleted_at_idx',
+                         condition=models.Q(deleted_at__isnull=False)),
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pulled_pub_date_idx',
+                         condition=models.Q(pushed_to_timelines=False)),
+        ]
 
 
 class Comment(models.Model):
@@ -73,6 +123,10 @@ class Comment(models.Model):
 
     class Meta:
         ordering: Tuple[str] = ('-created',)
+        indexes = [
+            models.Index(fields=['post', '-created', '-id'],
+                         name='comment_post_created_idx'),
+        ]
 
 
 class Follow(models.Model):
@@ -98,3 +152,99 @@ class Follow(models.Model):
             models.CheckConstraint(check=~models.Q(user=models.F("author")),
                                    name="check_following"),
         ]
+        indexes = [models.Index(
+            fields=["user", "author"], name="follow_user_author_idx"),
+        ]
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField()
+
+    def __str__(self):
+        return f'Пост {self.post_id} в ленте {self.user}'
+
+    class Meta:
+        constraints = [models.UniqueConstraint(
+            fields=["user", "post"], name="unique_timeline_entry"),
+        ]
+        indexes = [models.Index(
+            fields=["user", "-pub_date", "-post"],
+            name="timeline_user_pub_date_idx"),
+        ]
+
+
+class UserCounter(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+    )
+    posts = models.PositiveIntegerField('Постов', default=0)
+    followers = models.PositiveIntegerField('Подписчиков', default=0)
+    following = models.PositiveIntegerField('Подписок', default=0)
+
+    def __str__(self):
+        return f'Счётчики {self.user}'
+
+
+class Reaction(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='reactions',
+        verbose_name='Пользователь',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='reactions',
+        verbose_name='Пост',
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.user} отметил пост {self.post_id}'
+
+    class Meta:
+        constraints = [models.UniqueConstraint(
+            fields=["user", "post"], name="unique_reaction"),
+        ]
+
+
+class ReactionCounter(models.Model):
+    """Одна из ``REACTION_SHARDS`` строк счётчика отметок поста.
+
+    Отметка увеличивает случайную строку, так что отметки популярного
+    поста не выстраиваются в очередь за одной блокировкой. Значение
+    счётчика — сумма строк; отдельная строка может уйти в минус.
+    """
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='reaction_counters',
+        verbose_name='Пост',
+    )
+    shard = models.PositiveSmallIntegerField('Шард')
+    count = models.IntegerField('Отметок', default=0)
+
+    def __str__(self):
+        return f'Отметки поста {self.post_id}, шард {self.shard}'
+
+    class Meta:
+        constraints = [models.UniqueConstraint(
+            fields=["post", "shard"], name="unique_reaction_shard"),
+        ]
@@ -0,0 +1,122 @@
+import hashlib
+import random
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+
+from core.jobs import heartbeat
+from .feed_cache import bump_reactions_generation
+from .models import Reaction, ReactionCounter
+
+
+def _likes_key(post_id):
+    return f'posts:likes:{post_id}'
+
+
+def _bump(post_id, delta):
+    """Сдвинуть случайный шард счётчика поста."""
+    shard = random.randrange(settings.REACTION_SHARDS)
+    counters = ReactionCounter.objects.filter(post_id=post_id, shard=shard)
+    if not counters.update(count=F('count') + delta):
+        ReactionCounter.objects.get_or_create(post_id=post_id, shard=shard)
+        counters.update(count=F('count') + delta)
+
+
+def _changed(user_id, post_id, delta):
+    """Сдвинуть закешированный счёт, если он есть, и сбросить отметки
+    пользователя в ETag.
+    """
+    try:
+        cache.incr(_likes_key(post_id), delta)
+    except ValueError:
+        pass
+    bump_reactions_generation(user_id)
+
+
+def like(user, post_id):
+    """Отметить пост; False, если отметка уже была."""
+    try:
+        with transaction.atomic():
+            Reaction.objects.create(user=user, post_id=post_id)
+            _bump(post_id, 1)
+    except IntegrityError:
+        return False
+    _changed(user.pk, post_id, 1)
+    return True
+
+
+def unlike(user, post_id):
+    """Снять отметку; False, если её не было."""
+    with transaction.atomic():
+        deleted, _ = Reaction.objects.filter(
+            user=user, post_id=post_id).delete()
+        if deleted:
+            _bump(post_id, -1)
+    if deleted:
+        _changed(user.pk, post_id, -1)
+    return bool(deleted)
+
+
+def forget_user(user_id, chunk_size):
+    """Удалить отметки пользователя кусками, вычитая их из счётчиков."""
+    reactions = Reaction.objects.filter(user_id=user_id)
+    while True:
+        heartbeat()
+        chunk = list(reactions.values_list('pk', 'post_id')[:chunk_size])
+        if not chunk:
+            return
+        with transaction.atomic():
+            Reaction.objects.filter(
+                pk__in=[pk for pk, _ in chunk])._raw_delete(reactions.db)
+            for post_id, total in Counter(
+                    post_id for _, post_id in chunk).items():
+                _bump(post_id, -total)
+        cache.delete_many([_likes_key(post_id) for _, post_id in chunk])
+
+
+def like_counts(post_ids):
+    """Число отметок постов: из кеша, остальное одной выборкой сумм."""
+    keys = {_likes_key(post_id): post_id for post_id in post_ids}
+    counts = {keys[key]: value
+              for key, value in cache.get_many(list(keys)).items()}
+    missing = [post_id for post_id in post_ids if post_id not in counts]
+    if missing:
+        fresh = dict.fromkeys(missing, 0)
+        fresh.update(
+            ReactionCounter.objects.filter(post_id__in=missing)
+            .order_by().values('post_id').annotate(total=Sum('count'))
+            .values_list('post_id', 'total'))
+        cache.set_many({_likes_key(post_id): total
+                        for post_id, total in fresh.items()},
+                       settings.REACTIONS_CACHE_TIMEOUT)
+        counts.update(fresh)
+    return counts
+
+
+def liked_post_ids(user, post_ids):
+    """Какие из постов отметил пользователь — одним запросом."""
+    if not user.is_authenticated or not post_ids:
+        return set()
+    return set(Reaction.objects.filter(
+        user=user, post_id__in=post_ids).values_list('post_id', flat=True))
+
+
+def attach_reactions(posts, user):
+    """Проставить постам ``likes`` и ``liked``.
+
+    Возвращает ключ состояния отметок страницы для кеша фрагментов:
+    он меняется вместе с любым счётчиком или отметкой на странице и
+    различает анонима и вошедшего — у них разная разметка отметок.
+    """
+    post_ids = [post.pk for post in posts]
+    counts = like_counts(post_ids)
+    liked = liked_post_ids(user, post_ids)
+    for post in posts:
+        post.likes = counts.get(post.pk, 0)
+        post.liked = post.pk in liked
+    state = (user.is_authenticated,
+             [(post.pk, post.likes, post.liked) for post in posts])
+    return hashlib.md5(repr(state).encode()).hexdigest()
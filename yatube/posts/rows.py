@@ -0,0 +1,150 @@
+from django.conf import settings
+from django.db import models
+from django.db.models.query import BaseIterable, ValuesIterable
+
+POST_FIELDS = (
+    'id', 'text', 'pub_date', 'image', 'image_width', 'image_height',
+    'image_placeholder', 'views_count',
+    'author_id', 'author__username', 'author__first_name',
+    'author__last_name',
+    'group_id', 'group__slug', 'group__title',
+)
+
+
+class AuthorRow:
+    """Автор поста в ленте: только поля, которые выводит шаблон."""
+
+    __slots__ = ('id', 'username', 'first_name', 'last_name')
+
+    def __init__(self, id, username, first_name, last_name):
+        self.id = id
+        self.username = username
+        self.first_name = first_name
+        self.last_name = last_name
+
+    @property
+    def pk(self):
+        return self.id
+
+    def get_full_name(self):
+        return f'{self.first_name} {self.last_name}'.strip()
+
+    def __str__(self):
+        return self.username
+
+
+class GroupRow:
+    __slots__ = ('id', 'slug', 'title')
+
+    def __init__(self, id, slug, title):
+        self.id = id
+        self.slug = slug
+        self.title = title
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __str__(self):
+        return self.title
+
+
+class ImageRow:
+    """Имя картинки с хранилищем поля: хватает для ``url``,
+    ``attach_thumbnails`` и тега ``{% thumbnail %}``.
+    """
+
+    __slots__ = ('name', 'storage')
+
+    def __init__(self, name, storage):
+        self.name = name
+        self.storage = storage
+
+    @property
+    def url(self):
+        return self.storage.url(self.name)
+
+    def __bool__(self):
+        return bool(self.name)
+
+    def __str__(self):
+        return self.name or ''
+
+
+class PostRow:
+    """Пост в ленте без экземпляров моделей.
+
+    Атрибуты повторяют те, что читают ``includes/post.html``,
+    ``CursorPaginator`` и ``attach_thumbnails``. С постом-моделью
+    сравнивается по ``pk``, как модели между собой.
+    """
+
+    __slots__ = ('id', 'text', 'pub_date', 'image', 'image_width',
+                 'image_height', 'image_placeholder', 'views_count',
+                 'author', 'group', 'thumbnail', 'variants', 'likes', 'liked')
+
+    def __init__(self, id, text, pub_date, image, image_width, image_height,
+                 image_placeholder, views_count, author, group):
+        self.id = id
+        self.text = text
+        self.pub_date = pub_date
+        self.image = image
+        self.image_width = image_width
+        self.image_height = image_height
+        self.image_placeholder = image_placeholder
+        self.views_count = views_count
+        self.author = author
+        self.group = group
+        self.thumbnail = None
+        self.variants = {}
+        self.likes = 0
+        self.liked = False
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __eq__(self, other):
+        if isinstance(other, PostRow):
+            return self.id == other.id
+        if isinstance(other, models.Model):
+            return (other._meta.label_lower == 'posts.post'
+                    and other.pk == self.id)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __str__(self):
+        return self.text[:settings.POST_STR]
+
+
+class PostRowIterable(BaseIterable):
+    """Строки ``values()`` в ``PostRow``. Авторы и группы, повторяющиеся
+    на странице, создаются по разу.
+    """
+
+    def __iter__(self):
+        storage = self.queryset.model._meta.get_field('image').storage
+        authors = {}
+        groups = {}
+        for values in ValuesIterable(self.queryset, self.chunked_fetch,
+                                     self.chunk_size):
+            author = authors.get(values['author_id'])
+            if author is None:
+                author = authors[values['author_id']] = AuthorRow(
+                    values['author_id'], values['author__username'],
+                    values['author__first_name'],
+                    values['author__last_name'])
+            group = None
+            if values['group_id'] is not None:
+                group = groups.get(values['group_id'])
+                if group is None:
+                    group = groups[values['group_id']] = GroupRow(
+                        values['group_id'], values['group__slug'],
+                        values['group__title'])
+            yield PostRow(
+                values['id'], values['text'], values['pub_date'],
+                ImageRow(values['image'], storage), values['image_width'],
+                values['image_height'], values['image_placeholder'],
+                values['views_count'], author, group)
@@ -0,0 +1,96 @@
+import re
+
+from django.db import connection
+from django.db.migrations import RunPython
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+
+# Триггеры, которые держат индекс в согласии с posts_post.
+FTS_TRIGGERS = (
+    "CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text); "
+    "END",
+    "CREATE TRIGGER posts_post_fts_delete AFTER DELETE ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts(posts_post_fts, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    "END",
+    "CREATE TRIGGER posts_post_fts_update AFTER UPDATE OF text "
+    "ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts(posts_post_fts, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    "INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text); "
+    "END",
+)
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def restore_fts_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in FTS_TRIGGERS:
+        schema_editor.execute(statement)
+
+
+def preserving_fts_triggers(*operations):
+    """Операции миграции, после которых триггеры индекса создаются заново.
+
+    Изменение столбцов в SQLite пересоздаёт posts_post, и триггеры
+    пропадают; восстановить их нужно и при применении, и при откате.
+    """
+    return [
+        RunPython(RunPython.noop, restore_fts_triggers),
+        *operations,
+        RunPython(restore_fts_triggers, RunPython.noop),
+    ]
+
+
+def match_expression(query):
+    """Поисковая строка в синтаксисе FTS5: каждое слово — префикс,
+    все слова обязательны. Операторы FTS5 из ввода не пропускаются.
+    """
+    return ' '.join(f'"{word}"*' for word in WORD_RE.findall(query))
+
+
+def matching_ids(query):
+    """Подзапрос с id постов, подходящих под ``query``."""
+    return RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        (match_expression(query),),
+    )
+
+
+def search_posts(query, offset, limit):
+    """Посты по релевантности, не более ``limit`` начиная с ``offset``."""
+    expression = match_expression(query)
+    if not expression:
+        return []
+    posts = Post.objects.select_related('author', 'group')
+    if not fts_available():
+        return list(posts.filter(text__icontains=query)[offset:offset + limit])
+    # Удалённые посты отсекаются до LIMIT, иначе они съедали бы места
+    # на странице.
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT {FTS_TABLE}.rowid FROM {FTS_TABLE} '
+            f'JOIN {Post._meta.db_table} post ON post.id = {FTS_TABLE}.rowid '
+            f'WHERE {FTS_TABLE} MATCH %s AND post.deleted_at IS NULL '
+            f'ORDER BY rank LIMIT %s OFFSET %s',
+            (expression, limit, offset),
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+    found = posts.in_bulk(ids)
+    return [found[pk] for pk in ids if pk in found]
+
+
+def rebuild_index():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
@@ -0,0 +1,150 @@
+from django.core.signals import request_finished
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.invalidation import publish
+from . import counters, timeline, view_counts
+from .feed_cache import bump_feed_generation, bump_page_generation
+from .lookups import group_tags, user_tags
+from .models import Comment, Follow, Group, Post, User
+
+
+@receiver(pre_save, sender=Post)
+def decide_fan_out(sender, instance, **kwargs):
+    if instance._state.adding:
+        instance.pushed_to_timelines = timeline.should_fan_out(
+            instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def push_to_timelines(sender, instance, created, **kwargs):
+    if created and instance.pushed_to_timelines:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def fill_timeline(sender, instance, created, **kwargs):
+    if created:
+        timeline.backfill(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def clean_timeline(sender, instance, **kwargs):
+    timeline.prune(instance)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_user(instance.author_id, 'posts', 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    # Скрытый пост вычтен из счётчика ещё в delete_post.
+    if instance.deleted_at is None:
+        counters.bump_user(instance.author_id, 'posts', -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.bump_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_user(instance.author_id, 'followers', 1)
+        counters.bump_user(instance.user_id, 'following', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, 'followers', -1)
+    counters.bump_user(instance.user_id, 'following', -1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_feed_cache(sender, **kwargs):
+    bump_feed_generation()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_page_cache(sender, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    bump_page_generation()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def publish_post_change(sender, instance, **kwargs):
+    publish(f'post:{instance.pk}', f'user:{instance.author_id}')
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def publish_comment_change(sender, instance, **kwargs):
+    publish(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def publish_follow_change(sender, instance, **kwargs):
+    publish(f'user:{instance.user_id}', f'user:{instance.author_id}')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def publish_group_change(sender, instance, **kwargs):
+    publish(*group_tags(instance.pk, instance.slug))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def publish_user_change(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    publish(*user_tags(instance.pk, instance.username))
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_image(sender, instance, **kwargs):
+    if not instance._state.adding:
+        instance._old_image = Post.objects.filter(
+            pk=instance.pk).values_list('image', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, **kwargs):
+    old_image = getattr(instance, '_old_image', None)
+    if old_image and old_image != instance.image.name:
+        instance.image.storage.release(old_image)
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    if instance.image:
+        instance.image.storage.release(instance.image.name)
+
+
+@receiver(request_finished)
+def flush_view_counts(sender, **kwargs):
+    # Сигнал приходит, когда ответ уже отдан: сброс не задерживает его.
+    view_counts.flush_if_due()
@@ -0,0 +1,39 @@
+from django import template
+from django.conf import settings
+
+register = template.Library()
+
+MIME_TYPES = {'WEBP': 'image/webp', 'PNG': 'image/png', 'JPEG': 'image/jpeg'}
+
+
+def _srcset(ladder):
+    return ', '.join(f'{image.url} {width}w' for width, image in ladder)
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def post_picture(post):
+    """Картинка поста: ``<picture>`` с вариантами из ``attach_thumbnails``
+    или, пока их нет, одна миниатюра ``THUMBNAIL_PRESETS['feed']``.
+
+    Последний формат из ``IMAGE_VARIANT_FORMATS`` идёт в ``<img>`` как
+    запасной, остальные — в ``<source>``.
+    """
+    variants = getattr(post, 'variants', None) or {}
+    formats = [format_ for format_ in settings.IMAGE_VARIANT_FORMATS
+               if format_ in variants]
+    if not formats:
+        return {'post': post, 'fallback': None}
+    ladder = variants[formats[-1]]
+    feed_width = int(settings.THUMBNAIL_PRESETS['feed'][0].split('x')[0])
+    # Без поддержки srcset браузер возьмёт src: самый широкий вариант,
+    # не шире обычной ленты.
+    fallback = next((image for width, image in reversed(ladder)
+                     if width <= feed_width), ladder[0][1])
+    return {
+        'post': post,
+        'sources': [(MIME_TYPES[format_], _srcset(variants[format_]))
+                    for format_ in formats[:-1]],
+        'fallback': fallback,
+        'fallback_srcset': _srcset(ladder),
+        'sizes': settings.IMAGE_VARIANT_SIZES,
+    }
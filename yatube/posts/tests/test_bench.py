@@ -0,0 +1,63 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .. import timeline
+from ..models import Comment, Follow, Post, TimelineEntry, UserCounter
+
+
+class BenchCommandsTests(TestCase):
+    def test_seed_and_run_bench(self):
+        """seed_bench заполняет базу, run_bench отдаёт отчёт в JSON"""
+        call_command('seed_bench', users=20, groups=3, posts=200,
+                     comments=300, follows=3, batch_size=50,
+                     stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 300)
+        self.assertTrue(Follow.objects.exists())
+        self.assertEqual(UserCounter.objects.count(), 20)
+        output = StringIO()
+        call_command('run_bench', requests=3, concurrency=1, stdout=output)
+        report = json.loads(output.getvalue())
+        self.assertEqual(set(report['views']), {
+            'posts:index', 'posts:group_list', 'posts:profile',
+            'posts:post_detail', 'posts:follow_index'})
+        for stats in report['views'].values():
+            self.assertGreater(stats['queries_mean'], 0)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_seed_bench_fans_out(self):
+        """seed_bench раскладывает посты по лентам, как публикация:
+        посты «тяжёлых» авторов остаются неразложенными"""
+        call_command('seed_bench', users=20, groups=2, posts=100,
+                     comments=0, follows=3, batch_size=50,
+                     stdout=StringIO())
+        pushed = {}
+        for post in Post.objects.all():
+            if post.author_id not in pushed:
+                pushed[post.author_id] = timeline.should_fan_out(
+                    post.author_id)
+            self.assertEqual(post.pushed_to_timelines,
+                             pushed[post.author_id])
+        self.assertIn(False, pushed.values())
+        expected = sum(
+            Post.objects.filter(author_id=follow.author_id,
+                                pushed_to_timelines=True).count()
+            for follow in Follow.objects.all())
+        self.assertGreater(expected, 0)
+        self.assertEqual(TimelineEntry.objects.count(), expected)
+
+    def test_bench_rows(self):
+        """bench_rows сравнивает ленты из моделей и из PostRow"""
+        call_command('seed_bench', users=5, groups=2, posts=30,
+                     comments=0, follows=1, batch_size=50,
+                     stdout=StringIO())
+        output = StringIO()
+        call_command('bench_rows', pages=2, stdout=output)
+        report = json.loads(output.getvalue())
+        self.assertEqual(set(report), {'index', 'group_list', 'profile'})
+        for feed in report.values():
+            self.assertGreater(feed['models']['retained_kb'],
+                               feed['rows']['retained_kb'])
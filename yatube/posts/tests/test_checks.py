@@ -0,0 +1,23 @@
+from django.db.models import Q
+from django.test import TestCase
+
+from ..checks import check_feed_query_plans, plan_problems
+from ..models import Post
+
+
+class QueryPlanCheckTests(TestCase):
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент идут по индексам"""
+        self.assertEqual(check_feed_query_plans(None), [])
+
+    def test_full_scan_reported(self):
+        """Полное сканирование и сортировка попадают в предупреждения"""
+        problems = plan_problems(Post.objects.order_by('text'))
+        self.assertTrue(any('TEMP B-TREE' in item for item in problems))
+        self.assertTrue(any(item.startswith('SCAN') for item in problems))
+
+    def test_sort_after_or_reported(self):
+        """Сортировка после слияния выборок по OR тоже предупреждение"""
+        problems = plan_problems(Post.objects.filter(
+            Q(author_id=1) | Q(group_id=1)).order_by('-pub_date', '-id'))
+        self.assertTrue(any('TEMP B-TREE' in item for item in problems))
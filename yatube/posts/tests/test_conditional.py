@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='etag-group', description='Описание')
+        cls.post = Post.objects.create(author=cls.author, text='Пост',
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        caches['pages'].clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def revalidate(self, client, url):
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_pages_not_modified(self):
+        """Неизменившаяся страница отдаёт 304 без рендеринга"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.revalidate(self.reader_client, url)
+                self.assertEqual(response.status_code, 304)
+                self.assertIsNone(response.context)
+                self.assertIn('Cookie', response['Vary'])
+
+    def test_anonymous_cached_page_not_modified(self):
+        """Копия из кеша страниц тоже отвечает 304"""
+        response = self.revalidate(self.guest_client, reverse('posts:index'))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+
+    def test_changes_and_users_change_etag(self):
+        """ETag зависит от правок и от пользователя"""
+        url = reverse('posts:follow_index')
+        etag = self.reader_client.get(url)['ETag']
+        author_client = Client()
+        author_client.force_login(self.author)
+        self.assertNotEqual(author_client.get(url)['ETag'], etag)
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, self.post.text)
@@ -0,0 +1,64 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..models import Comment, Follow, Post, UserCounter
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются при создании и удалении объектов"""
+        post = Post.objects.create(author=self.user, text='Пост')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Коммент')
+        follow = Follow.objects.create(user=self.reader, author=self.user)
+        post.refresh_from_db()
+        counters = UserCounter.objects.get(user=self.user)
+        self.assertEqual(counters.posts, 1)
+        self.assertEqual(counters.followers, 1)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(
+            UserCounter.objects.get(user=self.reader).following, 1)
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        counters.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(counters.followers, 0)
+
+    def test_sync_counters_repairs_drift(self):
+        """Команда sync_counters исправляет расхождения"""
+        post = Post.objects.create(author=self.user, text='Пост')
+        Comment.objects.create(post=post, author=self.reader, text='Ком')
+        UserCounter.objects.filter(user=self.user).update(posts=42)
+        Post.objects.filter(pk=post.pk).update(comments_count=7)
+        call_command('sync_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(UserCounter.objects.get(user=self.user).posts, 1)
+        self.assertEqual(post.comments_count, 1)
+
+    def test_sync_counters_batches_posts(self):
+        """Счётчики комментариев правятся одним UPDATE на все посты"""
+        posts = [Post.objects.create(author=self.user, text=f'Пост {number}')
+                 for number in range(3)]
+        Post.objects.update(comments_count=5)
+        with CaptureQueriesContext(connection) as queries:
+            call_command('sync_counters', stdout=StringIO())
+        updates = [query['sql'] for query in queries
+                   if query['sql'].startswith('UPDATE "posts_post"')]
+        self.assertEqual(len(updates), 1)
+        for post in posts:
+            post.refresh_from_db()
+            self.assertEqual(post.comments_count, 0)
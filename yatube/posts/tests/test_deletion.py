@@ -0,0 +1,104 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.jobs import Worker
+from core.models import Job
+from ..counters import user_counters
+from ..deletion import delete_existing
+from ..models import Comment, Follow, Post, UserCounter
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, PURGE_CHUNK_SIZE=2)
+class DeletionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        caches['pages'].clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def run_jobs(self):
+        with mock.patch('core.storage.transaction.on_commit',
+                        lambda callback: callback()):
+            Worker().run(once=True)
+
+    def test_post_hidden_then_purged(self):
+        """Пост пропадает сразу, а из базы и с диска — в фоне"""
+        post = Post.objects.create(
+            author=self.author, text='Удаляемый',
+            image=ContentFile(b'blob', name='blob.gif'))
+        for number in range(5):
+            Comment.objects.create(post=post, author=self.reader,
+                                   text=f'Комментарий {number}')
+        storage = post.image.storage
+        self.client.get(reverse('posts:post_delete', args=[post.pk]))
+        self.assertEqual(self.client.get(
+            reverse('posts:post_detail', args=[post.pk])).status_code, 404)
+        self.assertNotIn(post, self.client.get(
+            reverse('posts:index')).context['page_obj'])
+        self.assertEqual(user_counters(self.author).posts, 0)
+        self.assertTrue(Post.all_objects.filter(pk=post.pk).exists())
+        self.assertTrue(Job.objects.exists())
+        self.run_jobs()
+        self.assertFalse(Post.all_objects.filter(pk=post.pk).exists())
+        self.assertFalse(Comment.objects.filter(post_id=post.pk).exists())
+        self.assertFalse(storage.exists(post.image.name))
+        self.assertEqual(
+            UserCounter.objects.get(user=self.author).posts, 0)
+
+    def test_repeated_delete_counts_once(self):
+        """Повторное удаление тех же строк, как при повторе задачи, не
+        вычитает счётчики второй раз"""
+        post = Post.objects.create(author=self.reader, text='Пост')
+        comment = Comment.objects.create(post=post, author=self.author,
+                                         text='Комментарий')
+        Follow.objects.create(user=self.author, author=self.reader)
+        follow_ids = [Follow.objects.get().pk]
+        for _ in range(2):
+            delete_existing(Comment, [comment.pk])
+            delete_existing(Follow, follow_ids)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(user_counters(self.reader).followers, 0)
+        self.assertEqual(user_counters(self.author).following, 0)
+
+    def test_user_deleted_in_background(self):
+        """Пользователь отключается сразу, его данные удаляются в фоне"""
+        own_post = Post.objects.create(author=self.author, text='Свой')
+        other_post = Post.objects.create(author=self.reader, text='Чужой')
+        Comment.objects.create(post=other_post, author=self.author,
+                               text='Под чужим')
+        Follow.objects.create(user=self.reader, author=self.author)
+        call_command('delete_user', self.author.username, stdout=StringIO())
+        self.author.refresh_from_db()
+        self.assertFalse(self.author.is_active)
+        self.assertFalse(Post.objects.filter(pk=own_post.pk).exists())
+        self.run_jobs()
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+        self.assertFalse(Post.all_objects.filter(pk=own_post.pk).exists())
+        other_post.refresh_from_db()
+        self.assertEqual(other_post.comments_count, 0)
+        self.assertEqual(user_counters(self.reader).following, 0)
@@ -1,8 +1,13 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Follow, Group, Post
+from ..models import Follow, Group, Post, TimelineEntry
 
 
 User = get_user_model()
@@ -86,3 +91,85 @@ class FollowViewsTests(TestCase):
             user=self.user,
             author=self.user_follow,
         ).exists())
+
+    def test_new_post_pushed_to_follower_timeline(self):
+        """Новый пост автора попадает в ленту подписчика"""
+        Follow.objects.create(user=self.user, author=self.user_follow)
+        post = Post.objects.create(author=self.user_follow, text='Новый')
+        self.assertTrue(post.pushed_to_timelines)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.user, post=post).exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+
+    def test_unfollow_prunes_timeline(self):
+        """Отписка убирает посты автора из ленты"""
+        Follow.objects.create(user=self.user, author=self.user_follow)
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.user_follow.username}))
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.user).exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_posts_are_pulled(self):
+        """Посты популярного автора подмешиваются в ленту при чтении"""
+        Follow.objects.create(user=self.user, author=self.user_follow)
+        post = Post.objects.create(author=self.user_follow, text='Хит')
+        self.assertFalse(post.pushed_to_timelines)
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+
+    @override_settings(POST_LIM=2)
+    def test_mixed_feed_pages_by_cursor(self):
+        """Страницы ленты по курсору сливают разложенные и подмешанные
+        посты в одном порядке без пропусков и повторов"""
+        heavy = User.objects.create_user(username='heavy')
+        Follow.objects.create(user=self.user, author=self.user_follow)
+        Follow.objects.create(user=self.user, author=heavy)
+        posts = [self.post]
+        for number in range(5):
+            with override_settings(TIMELINE_FANOUT_LIMIT=0):
+                posts.append(Post.objects.create(
+                    author=heavy, text=f'Хит {number}'))
+            posts.append(Post.objects.create(
+                author=self.user_follow, text=f'Пост {number}'))
+        expected = sorted(posts, key=lambda post: (post.pub_date, post.pk),
+                          reverse=True)
+        url = reverse('posts:follow_index')
+        seen, params = [], {}
+        while True:
+            page = self.authorized_client.get(url, params).context['page_obj']
+            seen.extend(post.id for post in page)
+            if not page.next_cursor:
+                break
+            params = {'after': page.next_cursor}
+        self.assertEqual(seen, [post.pk for post in expected])
+        page = self.authorized_client.get(
+            url, {'before': page.previous_cursor}).context['page_obj']
+        self.assertEqual([post.id for post in page],
+                         [post.pk for post in expected[-3:-1]])
+
+    def test_rebuild_timelines_once_per_author(self):
+        """Пересборка лент проходит каждого автора один раз: число
+        запросов не растёт с числом постов"""
+        readers = [User.objects.create_user(username=f'reader{number}')
+                   for number in range(3)]
+        for reader in readers:
+            Follow.objects.create(user=reader, author=self.user_follow)
+
+        def rebuild():
+            TimelineEntry.objects.all().delete()
+            with CaptureQueriesContext(connection) as queries:
+                call_command('rebuild_timelines', stdout=StringIO())
+            return len(queries)
+
+        few = rebuild()
+        self.assertEqual(TimelineEntry.objects.count(), 3)
+        for number in range(5):
+            Post.objects.create(author=self.user_follow, text=f'Ещё {number}')
+        self.assertEqual(rebuild(), few)
+        self.assertEqual(TimelineEntry.objects.count(), 3 * 6)
@@ -1,19 +1,43 @@
+import hashlib
+import json
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
 
+from core.models import Job
+from ..forms import PostForm
 from ..models import Group, Post
+from ..thumbnails import generate_thumbnails
+from .utils import SMALL_GIF
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 User = get_user_model()
 
 
+def jpeg_with_exif(size=(4, 2)):
+    """JPEG с EXIF: описанием и поворотом на 90 градусов."""
+    exif = Image.Exif()
+    exif[0x010E] = 'секретное описание'
+    exif[0x0112] = 6
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'JPEG', exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+def stored_name(content, extension):
+    digest = hashlib.sha256(content).hexdigest()
+    return f'posts/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostFormTests(TestCase):
     @classmethod
@@ -75,9 +99,27 @@ class PostFormTests(TestCase):
                         text=form_data['text'],
                         group=form_data['group'],
                         author=self.user,
-                        image='posts/small.gif'
+                        image=stored_name(small_gif, '.gif')
                         ).exists())
 
+    def test_create_post_stores_image_meta(self):
+        """Размеры, тип, вес и заглушка картинки сохраняются при загрузке."""
+        uploaded = SimpleUploadedFile(
+            name='meta.gif',
+            content=SMALL_GIF,
+            content_type='image/gif'
+        )
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'С размерами', 'image': uploaded},
+        )
+        post = Post.objects.get(text='С размерами')
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertEqual(post.image_mime, 'image/gif')
+        self.assertEqual(post.image_bytes, len(SMALL_GIF))
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/jpeg;base64,'))
+
     def test_update_post(self):
         """Валидная форма изменяет запись в Post."""
         post_count = Post.objects.count()
@@ -112,4 +154,117 @@ class PostFormTests(TestCase):
             text=form_data['text'],
             group=form_data['group'],
             id=self.post.id,
-            image='posts/big.gif').exists())
+            image=stored_name(big_gif, '.gif')).exists())
+
+    def test_update_keeps_counters_and_deletion(self):
+        """Правка не перезаписывает счётчики и отметку удаления, которые
+        сдвинули, пока форма была открыта."""
+        post = Post.objects.get(pk=self.post.pk)
+        deleted_at = timezone.now()
+        Post.objects.filter(pk=post.pk).update(comments_count=5,
+                                               views_count=7)
+        Post.all_objects.filter(pk=post.pk).update(deleted_at=deleted_at)
+        form = PostForm({'text': 'Правка', 'group': self.group.id},
+                        instance=post)
+        self.assertTrue(form.is_valid())
+        form.save()
+        post = Post.all_objects.get(pk=post.pk)
+        self.assertEqual(post.text, 'Правка')
+        self.assertEqual((post.comments_count, post.views_count), (5, 7))
+        self.assertEqual(post.deleted_at, deleted_at)
+
+    def test_create_post_schedules_thumbnails(self):
+        """Миниатюры новой картинки ставятся в фоновую очередь."""
+        uploaded = SimpleUploadedFile(
+            name='thumb.gif',
+            content=SMALL_GIF,
+            content_type='image/gif'
+        )
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'С картинкой', 'image': uploaded},
+        )
+        job = Job.objects.get()
+        self.assertEqual(job.task, generate_thumbnails.name)
+        self.assertEqual(json.loads(job.args),
+                         [stored_name(SMALL_GIF, '.gif'), 2])
+
+    def test_exif_stripped_and_applied(self):
+        """EXIF удаляется из файла, а поворот из него применяется."""
+        uploaded = SimpleUploadedFile(
+            name='photo.jpg',
+            content=jpeg_with_exif(),
+            content_type='image/jpeg'
+        )
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Фото с EXIF', 'image': uploaded},
+        )
+        post = Post.objects.get(text='Фото с EXIF')
+        with post.image.open('rb') as stored, Image.open(stored) as image:
+            self.assertNotIn('exif', image.info)
+            self.assertEqual(image.size, (2, 4))
+        self.assertEqual((post.image_width, post.image_height), (2, 4))
+        self.assertEqual(post.image_mime, 'image/jpeg')
+
+    def test_upload_limits(self):
+        """Слишком большой файл и слишком много пикселей отклоняются."""
+        cases = (
+            ({'UPLOAD_MAX_BYTES': 100}, 'too_large'),
+            ({'UPLOAD_MAX_PIXELS': 7, 'UPLOAD_MAX_DECODED_PIXELS': 7},
+             'too_many_pixels'),
+        )
+        for limits, code in cases:
+            with self.subTest(code=code), override_settings(**limits):
+                uploaded = SimpleUploadedFile(
+                    name='photo.jpg',
+                    content=jpeg_with_exif(),
+                    content_type='image/jpeg'
+                )
+                response = self.authorized_client.post(
+                    reverse('posts:post_create'),
+                    data={'text': 'Не пройдёт', 'image': uploaded},
+                )
+                form = response.context['form']
+                self.assertEqual(form.errors.as_data()['image'][0].code,
+                                 code)
+                self.assertFalse(
+                    Post.objects.filter(text='Не пройдёт').exists())
+
+    @override_settings(UPLOAD_MAX_PIXELS=100, UPLOAD_MAX_DECODED_PIXELS=7)
+    def test_full_decode_formats_have_lower_pixel_limit(self):
+        """PNG декодируется целиком, и лимит пикселей для него ниже."""
+        def upload(name, format_):
+            buffer = BytesIO()
+            Image.new('RGB', (4, 2), 'red').save(buffer, format_)
+            return SimpleUploadedFile(name, buffer.getvalue())
+
+        for name, format_, valid in (('small.jpg', 'JPEG', True),
+                                     ('small.png', 'PNG', False)):
+            with self.subTest(format=format_):
+                form = PostForm({'text': 'Картинка'},
+                                {'image': upload(name, format_)})
+                self.assertEqual(form.is_valid(), valid)
+                if not valid:
+                    self.assertEqual(
+                        form.errors.as_data()['image'][0].code,
+                        'too_many_pixels')
+
+    @override_settings(UPLOAD_MAX_PIXELS=200_000,
+                       UPLOAD_MAX_DECODED_PIXELS=50_000)
+    def test_exif_jpeg_has_lower_pixel_limit(self):
+        """JPEG с EXIF пересохраняется с поворотом и декодируется
+        целиком, поэтому лимит пикселей для него тоже ниже."""
+        plain = BytesIO()
+        Image.new('RGB', (400, 200), 'red').save(plain, 'JPEG')
+        for name, content, valid in (
+                ('plain.jpg', plain.getvalue(), True),
+                ('exif.jpg', jpeg_with_exif((400, 200)), False)):
+            with self.subTest(name=name):
+                form = PostForm({'text': 'Картинка'},
+                                {'image': SimpleUploadedFile(name, content)})
+                self.assertEqual(form.is_valid(), valid)
+                if not valid:
+                    self.assertEqual(
+                        form.errors.as_data()['image'][0].code,
+                        'too_many_pixels')
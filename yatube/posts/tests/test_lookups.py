@@ -0,0 +1,44 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.invalidation import Subscriber, clear_local_caches
+from core.models import ChangeEvent
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class LookupCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='cached-group', description='Описание')
+
+    def setUp(self):
+        clear_local_caches()
+        # Авторизованному кеш целых страниц не отдаётся.
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.subscriber = Subscriber()
+        self.subscriber.poll()
+
+    def test_group_served_from_local_cache(self):
+        """Повторная страница группы не читает группу из БД,
+        а событие из журнала её вытесняет
+        """
+        url = reverse('posts:group_list', args=[self.group.slug])
+        self.client.get(url)
+        Group.objects.filter(pk=self.group.pk).update(title='Новое имя')
+        self.assertNotContains(self.client.get(url), 'Новое имя')
+        ChangeEvent.objects.create(tag=f'group:{self.group.pk}')
+        self.subscriber.poll()
+        self.assertContains(self.client.get(url), 'Новое имя')
+
+    def test_profile_counters_follow_new_posts(self):
+        """Новый пост автора сразу виден в счётчике профиля"""
+        url = reverse('posts:profile', args=[self.author.username])
+        self.assertEqual(self.client.get(url).context['post_count'], 0)
+        Post.objects.create(author=self.author, text='Пост')
+        self.assertEqual(self.client.get(url).context['post_count'], 1)
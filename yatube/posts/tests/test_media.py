@@ -0,0 +1,74 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.models import StoredFile
+from ..models import Post
+from .utils import SMALL_GIF
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaStorageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_migrate_media(self):
+        """Команда переносит старые файлы и считает ссылки"""
+        legacy = FileSystemStorage()
+        first = legacy.save('posts/first.gif', ContentFile(b'same'))
+        second = legacy.save('posts/second.gif', ContentFile(b'same'))
+        posts = [Post.objects.create(author=self.user, text=name)
+                 for name in (first, first, second)]
+        for post, name in zip(posts, (first, first, second)):
+            Post.objects.filter(pk=post.pk).update(image=name)
+        call_command('migrate_media', stdout=StringIO())
+        names = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        new_name = names.pop()
+        self.assertEqual(StoredFile.objects.get(name=new_name).refs, 3)
+        self.assertTrue(legacy.exists(new_name))
+        self.assertFalse(legacy.exists(first))
+        self.assertFalse(legacy.exists(second))
+
+    def test_post_delete_releases_image(self):
+        """Удаление поста убирает файл, только если он больше не нужен"""
+        posts = [Post.objects.create(
+            author=self.user, text='Пост',
+            image=ContentFile(b'shared', name='shared.gif'))
+            for _ in range(2)]
+        name = posts[0].image.name
+        storage = posts[0].image.storage
+        with mock.patch('core.storage.transaction.on_commit',
+                        lambda callback: callback()):
+            posts[0].delete()
+            self.assertTrue(storage.exists(name))
+            posts[1].delete()
+        self.assertFalse(storage.exists(name))
+
+    def test_fill_image_meta(self):
+        """Команда дописывает размеры картинкам старых постов"""
+        post = Post.objects.create(
+            author=self.user, text='Пост',
+            image=ContentFile(SMALL_GIF, name='old.gif'))
+        call_command('fill_image_meta', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertEqual(post.image_bytes, len(SMALL_GIF))
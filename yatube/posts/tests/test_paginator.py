@@ -1,6 +1,7 @@
 import math
 
 from django.conf import settings
+from django.core.cache import caches
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase
 from django.urls import reverse
@@ -35,6 +36,7 @@ class PaginatorViewsTest(TestCase):
             cls.post_count = cls.POST_NUM_CHECK + 1
 
     def setUp(self):
+        caches['pages'].clear()
         self.guest_client = Client()
 
     def test_first_pages_contains_ten_records(self):
@@ -59,3 +61,38 @@ class PaginatorViewsTest(TestCase):
                                          + f'?page={num_pages}')
         self.assertEqual(len(response.context['page_obj']),
                          self.post_count - settings.POST_LIM * (num_pages - 1))
+
+    def test_cursor_pages_cover_feed_without_gaps(self):
+        """Переход по курсорам проходит всю ленту без повторов"""
+        seen = []
+        url = reverse('posts:index')
+        while url:
+            response = self.guest_client.get(url)
+            page_obj = response.context['page_obj']
+            seen.extend(post.pk for post in page_obj)
+            url = (reverse('posts:index') + f'?after={page_obj.next_cursor}'
+                   if page_obj.next_cursor else None)
+        self.assertEqual(
+            seen,
+            list(Post.objects.order_by('-pub_date', '-id')
+                 .values_list('pk', flat=True)))
+
+    def test_cursor_previous_page(self):
+        """Курсор before возвращает предыдущую страницу"""
+        first = self.guest_client.get(reverse('posts:index'))
+        first_page = first.context['page_obj']
+        second = self.guest_client.get(
+            reverse('posts:index') + f'?after={first_page.next_cursor}')
+        previous = self.guest_client.get(
+            reverse('posts:index')
+            + f'?before={second.context["page_obj"].previous_cursor}')
+        self.assertEqual(list(previous.context['page_obj']),
+                         list(first_page))
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Битый курсор отдаёт первую страницу"""
+        response = self.guest_client.get(reverse('posts:index')
+                                         + '?after=broken')
+        self.assertEqual(len(response.context['page_obj']),
+                         settings.POST_LIM)
+        self.assertIsNone(response.context['page_obj'].previous_cursor)
@@ -0,0 +1,103 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.db.models import Sum
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import reactions
+from ..models import Post, Reaction, ReactionCounter
+
+User = get_user_model()
+
+
+@override_settings(REACTION_SHARDS=4)
+class ReactionsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='auth')
+        cls.posts = [Post.objects.create(author=cls.author, text=f'Пост {n}')
+                     for n in range(3)]
+        cls.readers = [User.objects.create_user(username=f'reader{n}')
+                       for n in range(5)]
+
+    def setUp(self):
+        cache.clear()
+        caches['pages'].clear()
+        self.client = Client()
+        self.client.force_login(self.readers[0])
+
+    def test_like_and_unlike(self):
+        """Отметка ставится и снимается, повтор ничего не меняет"""
+        post = self.posts[0]
+        like_url = reverse('posts:post_like', args=[post.pk])
+        unlike_url = reverse('posts:post_unlike', args=[post.pk])
+        for _ in range(2):
+            self.assertEqual(self.client.post(like_url).status_code, 204)
+        self.assertEqual(Reaction.objects.filter(post=post).count(), 1)
+        self.assertEqual(reactions.like_counts([post.pk]), {post.pk: 1})
+        for _ in range(2):
+            self.assertEqual(self.client.post(unlike_url).status_code, 204)
+        self.assertFalse(Reaction.objects.filter(post=post).exists())
+        self.assertEqual(reactions.like_counts([post.pk]), {post.pk: 0})
+
+    def test_count_is_sum_of_shards(self):
+        """Счёт поста — сумма его шардов"""
+        post = self.posts[1]
+        for reader in self.readers:
+            reactions.like(reader, post.pk)
+        reactions.unlike(self.readers[0], post.pk)
+        cache.clear()
+        self.assertLessEqual(
+            ReactionCounter.objects.filter(post=post).count(), 4)
+        self.assertEqual(
+            ReactionCounter.objects.filter(post=post).aggregate(
+                total=Sum('count'))['total'], 4)
+        self.assertEqual(reactions.like_counts([post.pk]), {post.pk: 4})
+
+    def test_page_reactions_take_two_queries(self):
+        """Счета и отметки страницы — одна выборка каждое"""
+        reactions.like(self.readers[0], self.posts[2].pk)
+        cache.clear()
+        posts = list(Post.objects.order_by('pk'))
+        with self.assertNumQueries(2):
+            reactions.attach_reactions(posts, self.readers[0])
+        self.assertEqual([(post.likes, post.liked) for post in posts],
+                         [(0, False), (0, False), (1, True)])
+        with self.assertNumQueries(1):
+            reactions.attach_reactions(posts, self.readers[0])
+
+    def test_page_shows_own_like(self):
+        """Своя отметка видна на главной сразу после нажатия"""
+        self.client.get(reverse('posts:index'))
+        self.client.post(reverse('posts:post_like', args=[self.posts[0].pk]))
+        page = self.client.get(reverse('posts:index')).context['page_obj']
+        liked = {post.pk: (post.likes, post.liked) for post in page}
+        self.assertEqual(liked[self.posts[0].pk], (1, True))
+
+    def test_cached_index_markup_depends_on_login(self):
+        """Кнопка отметки в кеше главной не достаётся анониму и наоборот"""
+        url = reverse('posts:index')
+        like_url = reverse('posts:post_like', args=[self.posts[0].pk])
+        User.objects.create_user(username='fresh')
+        fresh = Client()
+        fresh.force_login(User.objects.get(username='fresh'))
+        self.assertContains(fresh.get(url), like_url)
+        self.assertNotContains(Client().get(url), like_url)
+        caches['pages'].clear()
+        cache.clear()
+        self.assertNotContains(Client().get(url), like_url)
+        self.assertContains(fresh.get(url), like_url)
+
+    def test_anonymous_cannot_like(self):
+        """Аноним отправляется на вход, отметка не ставится"""
+        url = reverse('posts:post_like', args=[self.posts[0].pk])
+        response = Client().post(url)
+        self.assertRedirects(
+            response, f"{reverse('users:login')}?next={url}")
+        self.assertFalse(Reaction.objects.exists())
+
+    def test_like_requires_post(self):
+        url = reverse('posts:post_like', args=[self.posts[0].pk])
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.assertEqual(self.client.post(
+            reverse('posts:post_like', args=[0])).status_code, 404)
@@ -0,0 +1,43 @@
+from django.test import TestCase
+
+from ..models import Group, Post, User
+from ..rows import PostRow
+
+
+class PostRowsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='auth', first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.posts = [
+            Post.objects.create(author=cls.author, group=cls.group,
+                                text=f'Пост {number}')
+            for number in range(3)
+        ]
+        cls.ungrouped = Post.objects.create(author=cls.author, text='Без')
+
+    def test_rows_match_models(self):
+        """PostRow несёт поля, которые показывает лента"""
+        rows = {row.pk: row for row in Post.objects.rows()}
+        for post in Post.objects.select_related('author', 'group'):
+            row = rows[post.pk]
+            self.assertIsInstance(row, PostRow)
+            self.assertEqual(row, post)
+            self.assertEqual(row.text, post.text)
+            self.assertEqual(row.pub_date, post.pub_date)
+            self.assertEqual(bool(row.image), bool(post.image))
+            self.assertEqual(row.author.get_full_name(),
+                             post.author.get_full_name())
+            self.assertEqual(row.author.username, post.author.username)
+            self.assertEqual(row.group and row.group.slug,
+                             post.group and post.group.slug)
+
+    def test_related_rows_shared(self):
+        """Автор и группа создаются на выборку один раз"""
+        with self.assertNumQueries(1):
+            rows = list(self.group.posts.rows())
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(len({id(row.author) for row in rows}), 1)
+        self.assertEqual(len({id(row.group) for row in rows}), 1)
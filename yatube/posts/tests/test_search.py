@@ -0,0 +1,93 @@
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Post
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Весенний лес и ручьи')
+        cls.other = Post.objects.create(
+            author=cls.user, text='Осенний город')
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query):
+        response = self.guest_client.get(reverse('posts:search'),
+                                         {'q': query})
+        return response.context['posts']
+
+    def test_search_finds_post(self):
+        """Поиск находит пост по слову и префиксу"""
+        self.assertEqual(self.search('лес'), [self.post])
+        self.assertEqual(self.search('ручь'), [self.post])
+        self.assertEqual(self.search('лес город'), [])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при изменении и удалении поста"""
+        other = Post.objects.get(pk=self.other.pk)
+        other.text = 'Осенний лес'
+        other.save()
+        self.assertCountEqual(self.search('лес'), [self.post, other])
+        Post.objects.get(pk=self.post.pk).delete()
+        self.assertEqual(self.search('лес'), [other])
+
+    @override_settings(POST_LIM=1)
+    def test_search_pages(self):
+        """Ссылка на следующую страницу есть, пока результаты не кончились"""
+        Post.objects.create(author=self.user, text='Лес у реки')
+        url = reverse('posts:search')
+        first = self.guest_client.get(url, {'q': 'лес'})
+        self.assertTrue(first.context['has_next'])
+        self.assertContains(first, 'page=2')
+        last = self.guest_client.get(url, {'q': 'лес', 'page': 2})
+        self.assertEqual(len(last.context['posts']), 1)
+        self.assertFalse(last.context['has_next'])
+
+    @override_settings(POST_LIM=2)
+    def test_deleted_posts_do_not_shorten_pages(self):
+        """Удалённые посты отсекаются до разбиения на страницы и не
+        занимают на них места"""
+        live = Post.objects.create(author=self.user,
+                                   text='Лес после дождя пахнет хвоей')
+        deleted = [Post.objects.create(author=self.user, text='Лес лес лес')
+                   for _ in range(3)]
+        Post.all_objects.filter(
+            pk__in=[post.pk for post in deleted]).update(
+            deleted_at=timezone.now())
+        response = self.guest_client.get(reverse('posts:search'),
+                                         {'q': 'лес'})
+        self.assertCountEqual(response.context['posts'], [self.post, live])
+        self.assertFalse(response.context['has_next'])
+
+    def test_huge_page_is_clamped(self):
+        """Огромный номер страницы не роняет поиск"""
+        response = self.guest_client.get(
+            reverse('posts:search'),
+            {'q': 'лес', 'page': '10000000000000000000'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page_number'],
+                         settings.SEARCH_MAX_PAGE)
+
+    def test_query_syntax_is_escaped(self):
+        """Операторы FTS5 во вводе не ломают поиск"""
+        self.assertEqual(self.search('"лес"*) ('), [self.post])
+        self.assertEqual(self.search('***'), [])
+
+    def test_rebuild_command(self):
+        """Команда перестраивает индекс"""
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('город'), [self.other])
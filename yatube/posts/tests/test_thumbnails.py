@@ -0,0 +1,126 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import thumbnails
+from ..models import Post
+from .utils import SMALL_GIF
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailLookupTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        for number in range(3):
+            Post.objects.create(
+                author=cls.user,
+                text=f'Пост {number}',
+                image=SimpleUploadedFile(f'small{number}.gif', SMALL_GIF,
+                                         content_type='image/gif'),
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        thumbnails._local_cache.clear()
+        self.guest_client = Client()
+
+    def test_generated_thumbnails_resolved_in_one_query(self):
+        """Готовые миниатюры страницы ищутся одним запросом"""
+        posts = list(Post.objects.all())
+        for post in posts:
+            thumbnails.generate_thumbnails(post.image.name)
+        cache.clear()
+        with self.assertNumQueries(1):
+            thumbnails.attach_thumbnails(posts)
+        self.assertTrue(all(post.thumbnail.url for post in posts))
+        fresh = list(Post.objects.all())
+        with self.assertNumQueries(0):
+            thumbnails.attach_thumbnails(fresh)
+
+    def test_page_renders_pregenerated_thumbnails(self):
+        """Лента выводит заранее построенные миниатюры"""
+        post = Post.objects.first()
+        thumbnails.generate_thumbnails(post.image.name)
+        response = self.guest_client.get(reverse('posts:index'))
+        page_post = next(item for item in response.context['page_obj']
+                         if item.pk == post.pk)
+        self.assertContains(response, page_post.thumbnail.url)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT,
+                   IMAGE_VARIANT_WIDTHS=(480, 960),
+                   IMAGE_VARIANT_FORMATS=('PNG', 'JPEG'))
+class ImageVariantTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('variant.gif', SMALL_GIF,
+                                     content_type='image/gif'),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        thumbnails._local_cache.clear()
+
+    def test_ladder_limited_by_source_width(self):
+        """Шире исходника строится только самый узкий вариант"""
+        self.assertEqual(
+            [(format_, width, geometry) for format_, width, geometry, _
+             in thumbnails.variant_presets(1000)],
+            [('PNG', 480, '480x170'), ('PNG', 960, '960x339'),
+             ('JPEG', 480, '480x170'), ('JPEG', 960, '960x339')])
+        self.assertEqual(
+            [width for _, width, _, _ in thumbnails.variant_presets(2)],
+            [480, 480])
+
+    def test_webp_skipped_without_codec(self):
+        """WebP не строится, если Pillow его не умеет"""
+        with override_settings(IMAGE_VARIANT_FORMATS=('WEBP', 'JPEG')), \
+                mock.patch('posts.thumbnails.features.check',
+                           return_value=False):
+            self.assertEqual(thumbnails.variant_formats(), ['JPEG'])
+
+    def test_feed_renders_picture(self):
+        """Лента выводит <picture> с srcset готовых вариантов"""
+        call_command('build_image_variants', processes=1,
+                     stdout=StringIO())
+        post = Post.objects.get(pk=self.post.pk)
+        thumbnails.attach_thumbnails([post])
+        self.assertEqual([width for width, _ in post.variants['JPEG']],
+                         [480, 960])
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse('posts:index'))
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, 'type="image/png"')
+        self.assertContains(response, 'loading="lazy"')
+        jpeg_960 = post.variants['JPEG'][1][1]
+        self.assertContains(response, f'{jpeg_960.url} 960w')
@@ -0,0 +1,79 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.db import DatabaseError
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import view_counts
+from ..models import Post
+
+User = get_user_model()
+
+
+@override_settings(VIEW_COUNTS_FLUSH_INTERVAL=60 * 60)
+class ViewCountsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='auth')
+        cls.posts = [Post.objects.create(author=author, text=f'Пост {n}')
+                     for n in range(3)]
+
+    def setUp(self):
+        cache.clear()
+        caches['pages'].clear()
+        view_counts._pending.clear()
+
+    def test_views_buffered_until_flush(self):
+        """Просмотры, в том числе из кеша страниц, копятся до сброса"""
+        url = reverse('posts:post_detail', args=[self.posts[0].pk])
+        for _ in range(3):
+            self.client.get(url)
+        self.posts[0].refresh_from_db()
+        self.assertEqual(self.posts[0].views_count, 0)
+        self.assertEqual(view_counts.pending(), {self.posts[0].pk: 3})
+        self.assertEqual(view_counts.flush(), 1)
+        self.posts[0].refresh_from_db()
+        self.assertEqual(self.posts[0].views_count, 3)
+        self.assertEqual(view_counts.pending(), {})
+
+    @override_settings(VIEW_COUNTS_BATCH_SIZE=2)
+    def test_flush_is_one_update_per_batch(self):
+        """Сброс пишет пачками, прирост у каждого поста свой"""
+        for times, post in zip((1, 2, 2), self.posts):
+            for _ in range(times):
+                view_counts.record_view(post.pk)
+        with self.assertNumQueries(4):
+            view_counts.flush()
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list(
+                'views_count', flat=True)), [1, 2, 2])
+
+    def test_failed_flush_keeps_counts(self):
+        """Если запись не удалась, просмотры остаются в буфере"""
+        view_counts.record_view(self.posts[1].pk)
+        with mock.patch.object(view_counts, 'write',
+                               side_effect=DatabaseError), \
+                self.assertLogs('posts.view_counts', 'ERROR'):
+            self.assertEqual(view_counts.flush(), 0)
+        view_counts.record_view(self.posts[1].pk)
+        self.assertEqual(view_counts.pending(), {self.posts[1].pk: 2})
+
+    def test_counts_refresh_with_window(self):
+        """Записанные просмотры видны на главной и меняют ETag в следующем
+        окне счётчиков, даже без записей в ленту"""
+        client = Client()
+        client.force_login(User.objects.get(username='auth'))
+        url = reverse('posts:index')
+        with mock.patch('posts.views.counts_window', return_value=1):
+            etag = client.get(url)['ETag']
+        view_counts.record_view(self.posts[0].pk)
+        view_counts.flush()
+        with mock.patch('posts.views.counts_window', return_value=1):
+            self.assertEqual(client.get(
+                url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with mock.patch('posts.views.counts_window', return_value=2):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Просмотров: 1')
@@ -64,6 +64,7 @@ class PostPagesTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -78,7 +79,7 @@ class PostPagesTests(TestCase):
 
     def test_post_detail_pages_show_correct_context(self):
         """Шаблон post_detail сформирован с правильным контекстом."""
-        post_count = self.post.author.posts.count
+        post_count = self.post.author.posts.count()
         response = self.guest_client.get(reverse('posts:post_detail',
                                          kwargs={'post_id': self.post.id}))
         self.assertEqual(response.context.get('post'), self.post)
@@ -170,9 +171,7 @@ class PostPagesTests(TestCase):
         response_before_change = self.authorized_client.get(
             reverse('posts:index')
         )
-        post = Post.objects.first()
-        post.text = 'wtf'
-        post.save()
+        Post.objects.filter(pk=self.post.pk).update(text='wtf')
         response_after_change = self.authorized_client.get(
             reverse('posts:index')
         )
@@ -184,3 +183,38 @@ class PostPagesTests(TestCase):
         )
         self.assertNotEqual(response_before_change.content,
                             response_after_clear.content)
+
+    def test_cache_index_invalidated_on_post_save(self):
+        """Сохранение поста сразу сбрасывает кеш главной"""
+        response_before_change = self.authorized_client.get(
+            reverse('posts:index')
+        )
+        post = Post.objects.first()
+        post.text = 'Обновлённый пост'
+        post.save()
+        response_after_change = self.authorized_client.get(
+            reverse('posts:index')
+        )
+        self.assertNotEqual(response_before_change.content,
+                            response_after_change.content)
+        self.assertContains(response_after_change, 'Обновлённый пост')
+
+    def test_comments_paginated_with_fragment(self):
+        """Комментарии выводятся порциями, следующая порция — фрагментом"""
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.user, text=f'Ком {number}')
+            for number in range(settings.COMMENT_LIM + 4)
+        )
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), settings.COMMENT_LIM)
+        fragment = self.guest_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}),
+            {'after': comments.next_cursor})
+        self.assertTemplateUsed(fragment, 'posts/includes/comment_list.html')
+        self.assertTemplateNotUsed(fragment, 'base.html')
+        rest = fragment.context['comments']
+        self.assertEqual(len(rest), 5)
+        self.assertIsNone(rest.next_cursor)
+        self.assertFalse(set(comments) & set(rest))
@@ -0,0 +1,150 @@
+from collections import OrderedDict
+
+from django.conf import settings
+from PIL import Image, features
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.models import KVStore
+
+from core.jobs import task
+
+# Первый уровень кеша: уже найденные миниатюры внутри процесса.
+# Имя миниатюры — хэш исходника и опций, поэтому запись не устаревает.
+_local_cache = OrderedDict()
+
+
+def variant_formats():
+    """Форматы вариантов, которые умеет кодировать установленный Pillow."""
+    return [format_ for format_ in settings.IMAGE_VARIANT_FORMATS
+            if format_ != 'WEBP' or features.check('webp')]
+
+
+def variant_presets(image_width, preset='feed'):
+    """Лестница вариантов картинки: (формат, ширина, геометрия, опции).
+
+    Пропорции и кадрирование берутся из ``preset``. Ширины больше
+    исходной не строятся, кроме самой узкой; если ширина исходника
+    неизвестна, строится вся лестница.
+    """
+    geometry, options = settings.THUMBNAIL_PRESETS[preset]
+    base_width, base_height = (int(side) for side in geometry.split('x'))
+    widths = [width for width in settings.IMAGE_VARIANT_WIDTHS
+              if image_width is None or width <= image_width]
+    widths = widths or settings.IMAGE_VARIANT_WIDTHS[:1]
+    return [
+        (format_, width,
+         f'{width}x{round(width * base_height / base_width)}',
+         dict(options, format=format_))
+        for format_ in variant_formats()
+        for width in widths
+    ]
+
+
+@task
+def generate_thumbnails(image_name, image_width=None):
+    """Построить все миниатюры из ``THUMBNAIL_PRESETS`` и все варианты
+    для ``srcset``.
+    """
+    for geometry, options in settings.THUMBNAIL_PRESETS.values():
+        get_thumbnail(image_name, geometry, **options)
+    if image_width is None:
+        # Pillow читает только заголовок, картинка не декодируется.
+        with default.storage.open(image_name) as source, \
+                Image.open(source) as image:
+            image_width = image.width
+    for _, _, geometry, options in variant_presets(image_width):
+        get_thumbnail(image_name, geometry, **options)
+
+
+def _thumbnail_file(image_name, geometry, options):
+    """Файл миниатюры, который построил бы ``get_thumbnail``, без I/O."""
+    backend = default.backend
+    source = ImageFile(image_name)
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def _remember(key, image_file):
+    _local_cache[key] = image_file
+    _local_cache.move_to_end(key)
+    while len(_local_cache) > settings.THUMBNAIL_LOCAL_CACHE_SIZE:
+        _local_cache.popitem(last=False)
+
+
+def _lookup(keys):
+    """Найти записи KV-хранилища sorl: процесс, общий кеш, одна выборка
+    из БД на все оставшиеся ключи. Ключи без записи в ответ не попадают.
+    """
+    found = {key: _local_cache[key] for key in keys if key in _local_cache}
+    missing = [key for key in keys if key not in found]
+    if not missing:
+        return found
+    kv_cache = default.kvstore.cache
+    cached = kv_cache.get_many(missing)
+    raw = {key: value for key, value in cached.items()
+           if value != EMPTY_VALUE}
+    missing = [key for key in missing if key not in cached]
+    if missing:
+        from_db = dict(KVStore.objects.filter(
+            key__in=missing).values_list('key', 'value'))
+        # Как и sorl, запоминаем отсутствие записи: не построенные ещё
+        # варианты не должны стоить запроса на каждой странице. sorl
+        # перезапишет метку, когда построит миниатюру.
+        kv_cache.set_many(
+            {key: from_db.get(key, EMPTY_VALUE) for key in missing},
+            sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        raw.update(from_db)
+    for key, value in raw.items():
+        found[key] = deserialize_image_file(value)
+        _remember(key, found[key])
+    return found
+
+
+def attach_thumbnails(posts, preset='feed'):
+    """Проставить постам ``thumbnail`` и ``variants`` одним запросом на
+    всю страницу.
+
+    ``variants`` — готовые варианты по форматам: ``{'WEBP': [(ширина,
+    файл), ...]}``. Посты, для которых миниатюра ещё не построена,
+    остаются без ``thumbnail``, и шаблон строит её тегом
+    ``{% thumbnail %}``.
+    """
+    geometry, options = settings.THUMBNAIL_PRESETS[preset]
+    keys = {}
+    for post in posts:
+        post.variants = {}
+        if not post.image:
+            continue
+        thumbnail = _thumbnail_file(post.image.name, geometry, options)
+        keys.setdefault(add_prefix(thumbnail.key), []).append(
+            (post, None, None))
+        for format_, width, variant_geometry, variant_options in (
+                variant_presets(post.image_width, preset)):
+            variant = _thumbnail_file(post.image.name, variant_geometry,
+                                      variant_options)
+            keys.setdefault(add_prefix(variant.key), []).append(
+                (post, format_, width))
+    for key, image_file in _lookup(list(keys)).items():
+        for post, format_, width in keys[key]:
+            if format_ is None:
+                post.thumbnail = image_file
+            else:
+                post.variants.setdefault(format_, []).append(
+                    (width, image_file))
+    for post in posts:
+        for ladder in post.variants.values():
+            ladder.sort(key=lambda variant: variant[0])
+    return posts
@@ -0,0 +1,119 @@
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+
+from core.paginator import CursorPaginator
+from .models import Follow, Post, TimelineEntry
+
+
+def should_fan_out(author_id):
+    followers = Follow.objects.filter(author_id=author_id).count()
+    return followers <= settings.TIMELINE_FANOUT_LIMIT
+
+
+def fan_out(post):
+    """Разложить новый пост по лентам подписчиков автора."""
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers.iterator()),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+    )
+
+
+def backfill(follow):
+    """Добавить в ленту подписчика уже опубликованные посты автора."""
+    posts = Post.objects.filter(
+        author_id=follow.author_id, pushed_to_timelines=True
+    ).values_list('pk', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=follow.user_id, post_id=pk, pub_date=pub_date)
+         for pk, pub_date in posts.iterator()),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def prune(follow):
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id, post__author_id=follow.author_id
+    ).delete()
+
+
+def timeline_entries(user):
+    """Записи ленты подписчика о неудалённых постах."""
+    return TimelineEntry.objects.filter(
+        user=user, post__deleted_at__isnull=True)
+
+
+def pulled_posts(user):
+    """Посты «тяжёлых» авторов из подписок, которые не раскладывались
+    по лентам при публикации.
+    """
+    # EXISTS вместо IN: так выборку ведёт частичный индекс по дате и
+    # сортировка не нужна.
+    return Post.objects.filter(pushed_to_timelines=False).annotate(
+        followed=Exists(Follow.objects.filter(
+            user=user, author_id=OuterRef('author_id'))),
+    ).filter(followed=True)
+
+
+def timeline_posts(user):
+    """Посты ленты подписок одним запросом: свои записи ленты плюс посты
+    «тяжёлых» авторов. Для счёта и устаревших ``?page=N``; страницы по
+    курсору строит ``TimelinePaginator``.
+    """
+    entries = TimelineEntry.objects.filter(user=user).values('post_id')
+    pulled_authors = Follow.objects.filter(user=user).values('author_id')
+    return Post.objects.filter(
+        Q(pk__in=entries)
+        | Q(pushed_to_timelines=False, author_id__in=pulled_authors)
+    )
+
+
+class TimelinePaginator(CursorPaginator):
+    """Keyset-пагинация ленты подписок.
+
+    Страница читается диапазоном по индексу ``(user, pub_date, post_id)``
+    записей ленты, а посты «тяжёлых» авторов — отдельным срезом по
+    частичному индексу неразложенных постов с тем же курсором. Из двух
+    срезов берутся первые ``limit`` id, и строки постов догружаются
+    одним запросом по первичному ключу.
+    """
+
+    ENTRY_FIELDS = ('pub_date', 'post_id')
+
+    def __init__(self, user, per_page, **kwargs):
+        self.user = user
+        super().__init__(timeline_posts(user).rows(), per_page, **kwargs)
+
+    def _slice(self, queryset, fields, values, forward, limit):
+        ordering = [f'-{field}' if self.descending else field
+                    for field in fields]
+        if values is not None:
+            queryset = queryset.filter(
+                self._keyset_filter(values, forward, fields))
+        if not forward:
+            ordering = self._reversed_ordering(ordering)
+        return queryset.order_by(*ordering).values_list(*fields)[:limit]
+
+    def slices(self, values, forward, limit):
+        """Запросы двух срезов ленты: записи ленты и посты «тяжёлых»
+        авторов, каждый — диапазон своего индекса.
+        """
+        return (
+            self._slice(timeline_entries(self.user), self.ENTRY_FIELDS,
+                        values, forward, limit),
+            self._slice(pulled_posts(self.user), self.fields,
+                        values, forward, limit),
+        )
+
+    def window(self, values, forward, limit):
+        keys = set()
+        for queryset in self.slices(values, forward, limit):
+            keys.update(queryset)
+        keys = sorted(keys, reverse=self.descending == forward)[:limit]
+        ids = [pk for _, pk in keys]
+        rows = {row.id: row
+                for row in Post.objects.filter(pk__in=ids).rows()}
+        return [rows[pk] for pk in ids if pk in rows]
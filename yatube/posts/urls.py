@@ -14,8 +14,14 @@ urlpatterns = [
     path('posts/<int:post_id>/edit/', views.post_edit, name='update_post'),
     path('posts/<int:post_id>/comment/',
          views.add_comment, name='add_comment'),
+    path('posts/<int:post_id>/comments/',
+         views.post_comments, name='post_comments'),
     path('delete/<int:post_id>/', views.post_delete, name='post_delete'),
+    path('posts/<int:post_id>/like/', views.post_like, name='post_like'),
+    path('posts/<int:post_id>/unlike/', views.post_unlike,
+         name='post_unlike'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
     path(
         'profile/<str:username>/follow/', views.profile_follow,
         name='profile_follow'
@@ -0,0 +1,78 @@
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+# post_id -> просмотры с прошлого сброса в этом процессе.
+_pending = Counter()
+_last_flush = time.monotonic()
+
+
+def record_view(post_id):
+    with _lock:
+        _pending[post_id] += 1
+
+
+def pending():
+    with _lock:
+        return dict(_pending)
+
+
+def write(counts):
+    """Прибавить просмотры одним ``UPDATE ... CASE`` на пачку постов.
+
+    Посты с одинаковым приростом идут в одну ветку ``WHEN id IN (...)``,
+    так что параметров немногим больше, чем постов.
+    """
+    items = sorted(counts.items())
+    size = settings.VIEW_COUNTS_BATCH_SIZE
+    with transaction.atomic():
+        for start in range(0, len(items), size):
+            by_delta = defaultdict(list)
+            for post_id, delta in items[start:start + size]:
+                by_delta[delta].append(post_id)
+            Post.all_objects.filter(
+                pk__in=[post_id for post_id, _ in items[start:start + size]]
+            ).update(views_count=F('views_count') + Case(
+                *(When(pk__in=ids, then=Value(delta))
+                  for delta, ids in by_delta.items()),
+                default=Value(0), output_field=IntegerField(),
+            ))
+
+
+def flush():
+    """Записать накопленные просмотры; вернуть число постов.
+
+    Буфер забирается целиком до записи. Если запись не удалась, счёт
+    возвращается в буфер и уйдёт со следующим сбросом, так что при
+    падении процесса теряется не больше одного окна.
+    """
+    global _last_flush
+    with _lock:
+        counts = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+    if not counts:
+        return 0
+    try:
+        write(counts)
+    except DatabaseError:
+        logger.exception('Не удалось записать просмотры постов')
+        with _lock:
+            _pending.update(counts)
+        return 0
+    return len(counts)
+
+
+def flush_if_due():
+    if time.monotonic() - _last_flush >= settings.VIEW_COUNTS_FLUSH_INTERVAL:
+        flush()
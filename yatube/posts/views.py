@@ -1,77 +1,165 @@
-from django.core.paginator import Paginator
+import hashlib
+
 from django.contrib.auth.decorators import login_required
 from django.conf import settings
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404, render, redirect
-
+from django.views.decorators.http import condition, require_POST
+from django.views.decorators.vary import vary_on_cookie
+
+from core.paginator import CursorPaginator
+from .counters import user_counters
+from .deletion import delete_post
+from .feed_cache import (counts_window, feed_generation, page_generation,
+                         reactions_generation)
 from .forms import PostForm, CommentForm
-from .models import Follow, Group, Post, User
+from .lookups import get_author, get_group
+from .search import search_posts
+from .models import Follow, Post, User
+from .reactions import attach_reactions, like, unlike
+from .thumbnails import attach_thumbnails
+from .timeline import TimelinePaginator
+
+
+def page_etag(request, *args, **kwargs):
+    """ETag страницы без запросов к ленте и рендеринга.
+
+    Версия публичных страниц меняется при любой правке постов,
+    комментариев, подписок, групп и профилей; адрес несёт курсор
+    страницы, а пользователь — шапку, ленту подписок и свои отметки.
+    Окно счётчиков освежает просмотры и чужие отметки.
+    """
+    user_id = request.user.pk
+    parts = (page_generation(), counts_window(), request.get_full_path(),
+             user_id, reactions_generation(user_id) if user_id else None)
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
 
+def pagination(request, posts_list):
+    return paginate(request, CursorPaginator(posts_list, settings.POST_LIM))
 
-def pagination(page_number, posts_list):
-    return Paginator(posts_list, settings.POST_LIM).get_page(page_number)
 
+def paginate(request, paginator):
+    page_obj = paginator.get_cursor_page(request.GET)
+    attach_thumbnails(page_obj.object_list)
+    page_obj.reactions_key = attach_reactions(page_obj.object_list,
+                                              request.user)
+    return page_obj
 
+
+@vary_on_cookie
+@condition(etag_func=page_etag)
 def index(request):
-    posts = Post.objects.select_related('author', 'group')
+    posts = Post.objects.rows()
     title = 'Это главная страница проекта Yatube'
     header = 'Последние обновления на сайте'
     templates = 'posts/index.html'
     context = {
         'title': title,
         'header': header,
-        'page_obj': pagination(request.GET.get('page'), posts),
+        'page_obj': pagination(request, posts),
+        'feed_generation': feed_generation(),
+        'counts_window': counts_window(),
+        'cache_timeout': settings.INDEX_CACHE_TIMEOUT,
     }
     return render(request, templates, context)
 
 
+@vary_on_cookie
+@condition(etag_func=page_etag)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.select_related('author')
+    group = get_group(slug)
+    posts = group.posts.rows()
     templates = 'posts/group_list.html'
     context = {
         'group': group,
-        'page_obj': pagination(request.GET.get('page'), posts),
+        'page_obj': pagination(request, posts),
     }
     return render(request, templates, context)
 
 
+@vary_on_cookie
+@condition(etag_func=page_etag)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.select_related('group')
+    author = get_author(username)
+    posts = author.posts.rows()
     templates = 'posts/profile.html'
-    page_obj = pagination(request.GET.get('page'), posts)
+    page_obj = pagination(request, posts)
     following = (request.user.is_authenticated
                  and author.following.filter(user=request.user).exists())
+    counters = user_counters(author)
     context = {
         'author': author,
         'page_obj': page_obj,
-        'post_count': page_obj.paginator.count,
+        'post_count': counters.posts,
+        'followers_count': counters.followers,
         'following': following,
     }
     return render(request, templates, context)
 
 
+def comments_page(params, post):
+    return CursorPaginator(
+        post.comments.select_related('author'), settings.COMMENT_LIM,
+        ordering=('-created', '-id')).get_cursor_page(params)
+
+
+@vary_on_cookie
+@condition(etag_func=page_etag)
 def post_detail(request, post_id):
     post = get_object_or_404(
-        Post.objects.select_related('author', 'group'), pk=post_id)
+        Post.objects.select_related('author__counters', 'group'),
+        pk=post_id)
+    attach_thumbnails([post])
+    attach_reactions([post], request.user)
     templates = 'posts/post_detail.html'
-    comments = post.comments.select_related('author')
     context = {
         'post': post,
-        'post_count': post.author.posts.count,
+        'post_count': user_counters(post.author).posts,
         'form': CommentForm(),
-        'comments': comments,
+        'comments': comments_page(request.GET, post),
     }
     return render(request, templates, context)
 
 
+@vary_on_cookie
+@condition(etag_func=page_etag)
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    context = {
+        'post': post,
+        'comments': comments_page(request.GET, post),
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    try:
+        page_number = int(request.GET.get('page', 1))
+    except ValueError:
+        page_number = 1
+    page_number = min(max(page_number, 1), settings.SEARCH_MAX_PAGE)
+    found = search_posts(query, (page_number - 1) * settings.POST_LIM,
+                         settings.POST_LIM + 1)
+    posts = attach_thumbnails(found[:settings.POST_LIM])
+    attach_reactions(posts, request.user)
+    context = {
+        'query': query,
+        'posts': posts,
+        'page_number': page_number,
+        'has_next': (len(found) > settings.POST_LIM
+                     and page_number < settings.SEARCH_MAX_PAGE),
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
-        post = form.save(commit=False)
-        post.author = request.user
-        post.save()
+        form.instance.author = request.user
+        form.save()
         return redirect('posts:profile', username=request.user.username)
     return render(request, 'posts/create_post.html',
                   {'form': form})
@@ -114,20 +202,20 @@ def post_delete(request, post_id):
         Post.objects.select_related('author', 'group'), pk=post_id
     )
     if post_delete.author == request.user:
-        post_delete.delete()
+        delete_post(post_delete)
         return redirect('posts:profile', username=request.user.username)
     return render(request, 'core/403csrf.html')
 
 
 @login_required
+@vary_on_cookie
+@condition(etag_func=page_etag)
 def follow_index(request):
     template = 'posts/follow.html'
     title = 'Посты контент-мейкера'
-    posts = Post.objects.select_related('author').filter(
-        author__following__user=request.user
-    )
+    paginator = TimelinePaginator(request.user, settings.POST_LIM)
     context = {
-        'page_obj': pagination(request.GET.get('page'), posts),
+        'page_obj': paginate(request, paginator),
         'title': title,
     }
     return render(request, template, context)
@@ -148,3 +236,19 @@ def profile_unfollow(request, username):
         author=get_object_or_404(User, username=username)
     ).delete()
     return redirect('posts:profile', username=username)
+
+
+@login_required
+@require_POST
+def post_like(request, post_id):
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    like(request.user, post.pk)
+    return HttpResponse(status=204)
+
+
+@login_required
+@require_POST
+def post_unlike(request, post_id):
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    unlike(request.user, post.pk)
+    return HttpResponse(status=204)
@@ -1,4 +1,3 @@
-from django.core.mail import send_mail
 from django.urls import reverse_lazy
 from django.views.generic import CreateView
 
@@ -9,12 +8,3 @@ class SignUp(CreateView):
     form_class = CreationForm
     success_url = reverse_lazy('posts:index')
     template_name = 'users/signup.html'
-
-
-send_mail(
-    'Тема письма',
-    'Текст письма.',
-    'from@example.com',  # Это поле "От кого"
-    ['to@example.com'],  # Это поле "Кому" (можно указать список адресов)
-    fail_silently=False,  # Сообщать об ошибках («молчать ли об ошибках?»)
-)
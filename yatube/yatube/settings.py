@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -36,9 +37,91 @@ ALLOWED_HOSTS = [
 
 POST_LIM = 10
 
+# Поиск листается через OFFSET по релевантности; дальше этой страницы
+# не пускаем, чтобы огромный ?page= не переполнял OFFSET в SQLite.
+SEARCH_MAX_PAGE = 100
+
 POST_STR = 15
 
 COMMENT_STR = 15
+
+COMMENT_LIM = 20
+
+# Авторы с большим числом подписчиков не раскладываются по лентам
+# при публикации, их посты подмешиваются в ленту при чтении.
+TIMELINE_FANOUT_LIMIT = 5000
+
+TIMELINE_BATCH_SIZE = 500
+
+# Удалённые посты и пользователи стираются в фоне кусками по столько
+# строк, чтобы не держать в памяти все комментарии и подписки сразу.
+PURGE_CHUNK_SIZE = 500
+
+# Просмотры постов копятся в памяти процесса и записываются одним
+# UPDATE ... CASE на пачку постов не чаще раза в столько секунд.
+VIEW_COUNTS_FLUSH_INTERVAL = 5
+VIEW_COUNTS_BATCH_SIZE = 300
+
+# Счётчик отметок поста разбит на столько строк; сумма строк кешируется
+# на REACTIONS_CACHE_TIMEOUT секунд.
+REACTION_SHARDS = 8
+REACTIONS_CACHE_TIMEOUT = 60
+
+# Фрагмент главной сбрасывается сменой поколения ленты при записи постов.
+INDEX_CACHE_TIMEOUT = 60 * 60 * 6
+# Счётчики просмотров и отметок на странице обновляются не реже, чем
+# раз в столько секунд: окно входит в ETag и ключ фрагмента главной.
+COUNTS_REFRESH_INTERVAL = 60
+
+# Очередь фоновых задач в БД (run_workers): сколько задач воркер берёт
+# за раз, пауза при пустой очереди, срок блокировки взятой задачи,
+# после которого её заберёт другой воркер, и повторы с удвоением паузы.
+JOBS_BATCH_SIZE = 10
+JOBS_POLL_INTERVAL = 1
+JOBS_LOCK_TIMEOUT = 60 * 5
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_DELAY = 10
+JOBS_RETRY_MAX_DELAY = 60 * 60
+# Периодические задачи: имя задачи -> интервал в секундах. Их ставят
+# работающие воркеры, не чаще раза в интервал на хост.
+JOBS_PERIODIC = {
+    'core.invalidation.prune_change_log': 60 * 10,
+    # Подбирает письма, отложенные после неудачной попытки.
+    'core.mail.deliver_outbox': 60,
+}
+
+# Каталог общих для процессов хоста файлов: кешей в памяти и снимков
+# метрик. Тесты подменяют его своим (core.test_runner).
+RUNTIME_DIR = os.environ.get('YATUBE_RUNTIME_DIR', tempfile.gettempdir())
+
+# Гистограммы метрик запросов: каждый процесс сбрасывает свой снимок
+# в METRICS_DIR не чаще раза в METRICS_FLUSH_INTERVAL секунд. Снимки
+# завершившихся процессов удаляются при сборе.
+METRICS_DIR = os.path.join(RUNTIME_DIR, 'yatube_metrics')
+
+METRICS_FLUSH_INTERVAL = 5
+
+# Сколько групп, авторов и постов run_bench берёт в выборку адресов.
+BENCH_SAMPLE_SIZE = 500
+
+# Миниатюры, которые строятся заранее при загрузке картинки поста.
+# Геометрия и опции должны совпадать с тегами {% thumbnail %} в шаблонах.
+THUMBNAIL_PRESETS = {
+    'feed': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+# Сколько найденных миниатюр держать в памяти процесса.
+THUMBNAIL_LOCAL_CACHE_SIZE = 10000
+
+# Варианты картинки для srcset: ширины в пикселях и форматы, от
+# предпочтительного к запасному. WebP строится, только если его
+# поддерживает установленный Pillow.
+IMAGE_VARIANT_WIDTHS = (480, 960, 1440)
+IMAGE_VARIANT_FORMATS = ('WEBP', 'JPEG')
+IMAGE_VARIANT_SIZES = '(max-width: 960px) 100vw, 960px'
+
+# Наибольшая сторона размытой заглушки картинки, пикселей.
+IMAGE_PLACEHOLDER_SIZE = 16
 # Application definition
 
 INSTALLED_APPS = [
@@ -56,6 +139,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.InvalidationMiddleware',
+    'core.middleware.QueryMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,13 +148,15 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'posts.middleware.PostViewsMiddleware',
+    'core.middleware.AnonymousPageCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backend.TimedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -86,6 +173,8 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
@@ -144,7 +233,15 @@ LOGIN_REDIRECT_URL = 'posts:index'
 
 LOGOUT_REDIRECT_URL = ''
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# Письма сначала попадают в outbox в БД, а отправляет их задача
+# core.mail.deliver_outbox через OUTBOX_EMAIL_BACKEND: пачками по
+# OUTBOX_BATCH_SIZE на одно соединение, не чаще OUTBOX_RATE_LIMIT писем
+# в секунду, с OUTBOX_MAX_ATTEMPTS попытками на письмо.
+EMAIL_BACKEND = 'core.mail.OutboxBackend'
+OUTBOX_EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_RATE_LIMIT = 10
+OUTBOX_MAX_ATTEMPTS = 5
 
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
@@ -153,8 +250,57 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загрузки сразу пишутся во временный файл и обрезаются по лимиту.
+FILE_UPLOAD_HANDLERS = ['core.uploads.CappedUploadHandler']
+
+# Наибольший размер загружаемого файла в байтах и наибольшее число
+# пикселей картинки: больше не декодируется. JPEG декодируется в
+# уменьшенном масштабе, остальные форматы — целиком, до 4 байт на
+# пиксель, поэтому для них лимит ниже.
+UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+UPLOAD_MAX_PIXELS = 40_000_000
+UPLOAD_MAX_DECODED_PIXELS = 12_000_000
+
+# Общий для всех воркеров хоста кеш в файле, отображённом в память:
+# 16384 слота по 4 КБ, то есть 64 МБ.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.SharedMemoryCache',
+        'LOCATION': os.path.join(RUNTIME_DIR, 'yatube_cache.mmap'),
+        'OPTIONS': {
+            'SLOTS': 16384,
+            'SLOT_SIZE': 4096,
+        },
+    },
+    # Целые страницы для анонимов, сжатые zlib: 2048 слотов по 32 КБ.
+    'pages': {
+        'BACKEND': 'core.cache.SharedMemoryCache',
+        'LOCATION': os.path.join(RUNTIME_DIR, 'yatube_pages.mmap'),
+        'OPTIONS': {
+            'SLOTS': 2048,
+            'SLOT_SIZE': 32768,
+        },
+    },
 }
+
+# Шина инвалидации кешей внутри процессов: как часто воркер читает
+# журнал изменений, сколько событий за раз и сколько секунд их хранить.
+INVALIDATION_POLL_INTERVAL = 1
+INVALIDATION_BATCH_SIZE = 1000
+INVALIDATION_RETENTION = 60 * 60
+LOCAL_CACHE_SIZE = 1000
+
+# Кеш целых страниц для анонимов: сколько секунд страница свежая,
+# сколько её ещё можно отдавать устаревшей, пока один запрос её
+# пересобирает, и сколько ждать сборщика, если копии нет.
+PAGE_CACHE_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+)
+PAGE_CACHE_VERSION = 'posts.feed_cache.page_generation'
+PAGE_CACHE_TIMEOUT = 30
+PAGE_CACHE_STALE_TIMEOUT = 60 * 10
+PAGE_CACHE_LOCK_TIMEOUT = 10
+PAGE_CACHE_WAIT = 2
@@ -23,7 +23,8 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
-    path('about/', include('about.urls', namespace='about')), ]
+    path('about/', include('about.urls', namespace='about')),
+    path('', include('core.urls', namespace='core')), ]
 
 handler404 = 'core.views.page_not_found'
 handler500 = 'core.views.server_error'